@@ -1,26 +1,74 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import sys
+import argparse
 import json
 import os
+import signal
+import time
 import traceback
 import numpy as np
 
+from bcg_columns import (
+    BCG_CATEGORIES, INDEX_LIKE_COLUMNS, MISSING_SEGMENT, auto_rename_map, find_name_column_by_pattern, usable_columns
+)
+from bcg_numeric import to_numeric_tolerant
+from bcg_progress import emit_progress
+from bcg_render import build_render_payload, plot_error_image, remove_render_payload, render, start_render_worker
+from bcg_reviews import find_review_columns, review_summaries, review_tables_pandas
+
 # Get command line arguments
-# Usage: python ball.py input_csv_path output_image_path
-csv_file_path = sys.argv[1] if len(sys.argv) > 1 else "sample.csv"
-output_file_path = sys.argv[2] if len(sys.argv) > 2 else "bcg_matrix_output.png"
+# Usage: python ball.py input_csv_path output_image_path [--engine pandas|polars]
+#                       [--segment-by COLUMN [--segment-render grid|none]] [--skip-reviews]
+parser = argparse.ArgumentParser(description="Generate a BCG matrix image and summary from a CSV file")
+parser.add_argument("csv_file_path", nargs="?", default="sample.csv")
+parser.add_argument("output_file_path", nargs="?", default="bcg_matrix_output.png")
+parser.add_argument(
+    "--engine",
+    choices=["pandas", "polars"],
+    default=os.environ.get("BCG_ENGINE", "pandas"),
+    help="pandas (default) or polars: lazy, multithreaded query with the same summary output"
+)
+parser.add_argument(
+    "--segment-by",
+    default=None,
+    help="Column (e.g. Country) to compute a separate BCG matrix for each of its values"
+)
+parser.add_argument(
+    "--segment-render",
+    choices=["grid", "none"],
+    default="grid",
+    help="grid: one figure of small multiples with shared axes; none: overall matrix image, per-segment summaries only"
+)
+parser.add_argument(
+    "--skip-reviews",
+    action="store_true",
+    help="Do not compute rating and review-text features even if the CSV has those columns"
+)
+args = parser.parse_args()
+csv_file_path = args.csv_file_path
+output_file_path = args.output_file_path
+engine = args.engine
+segment_by = args.segment_by
+segment_render = args.segment_render
+analyse_reviews = not args.skip_reviews
+
+# Flush every line so progress and log output reach the caller as they happen
+sys.stdout.reconfigure(line_buffering=True)
 
 print(f"Processing file: {csv_file_path}")
 print(f"Output will be saved to: {output_file_path}")
+print(f"Engine: {engine}")
+if segment_by:
+    print(f"Segmenting by: {segment_by} (render: {segment_render})")
 
-try:
+def run_pandas_engine(csv_file_path, segment_by=None, analyse_reviews=True):
     # Load Dataset with more robust error handling
     print(f"Reading CSV file...")
+    # Segment labels come from the source text, so a gap in an integer column does not turn "10" into "10.0"
+    dtype = {segment_by: str} if segment_by else None
     try:
-        # First try with standard parameters
-        df = pd.read_csv(csv_file_path)
+        # First try with standard parameters (exact float parsing, as in the polars engine)
+        df = pd.read_csv(csv_file_path, float_precision='round_trip', dtype=dtype)
         print(f"Successfully read CSV with {len(df)} rows and {len(df.columns)} columns")
     except Exception as e:
         print(f"Error with standard CSV reading: {str(e)}")
@@ -28,7 +76,8 @@ try:
         
         try:
             # Try with error_bad_lines=False (skip bad lines)
-            df = pd.read_csv(csv_file_path, on_bad_lines='skip', escapechar='\\', quoting=1)
+            df = pd.read_csv(csv_file_path, on_bad_lines='skip', escapechar='\\', quoting=1,
+                             float_precision='round_trip', dtype=dtype)
             print(f"Successfully read CSV with error recovery: {len(df)} rows and {len(df.columns)} columns")
         except Exception as e2:
             print(f"Error with first recovery attempt: {str(e2)}")
@@ -36,14 +85,14 @@ try:
             try:
                 # Try with even more permissive settings
                 df = pd.read_csv(csv_file_path, on_bad_lines='skip', escapechar='\\', 
-                                quoting=3, encoding='utf-8', engine='python')
+                                quoting=3, encoding='utf-8', engine='python', dtype=dtype)
                 print(f"Successfully read CSV with python engine: {len(df)} rows and {len(df.columns)} columns")
             except Exception as e3:
                 print(f"Error with second recovery attempt: {str(e3)}")
                 
                 # Last resort: try to read with maximum flexibility
                 try:
-                    df = pd.read_csv(csv_file_path, sep=None, engine='python', on_bad_lines='skip')
+                    df = pd.read_csv(csv_file_path, sep=None, engine='python', on_bad_lines='skip', dtype=dtype)
                     print(f"Successfully read CSV with auto-detection: {len(df)} rows and {len(df.columns)} columns")
                 except Exception as e4:
                     print(f"All CSV reading attempts failed: {str(e4)}")
@@ -62,53 +111,23 @@ try:
                     raise Exception("Could not read CSV file with any method")
 
     print(f"Column names: {df.columns.tolist()}")
+    emit_progress("loaded", 25, rows=len(df))
     
-    # Step 0: Rename columns to expected names
-    def auto_rename_columns(df):
-        rename_map = {}
-        print("Attempting to identify important columns...")
-        
-        # Column name mappings
-        mappings = {
-            "MarketShare": ["share", "marketshare", "sharerate", "market_share", "marketvalue"],
-            "MarketGrowth": ["growth", "marketgrowth", "growthrate", "growth_rate", "marketgrowthrate"],
-            "Quantity": ["quantity", "count", "units", "sold", "qty", "volume", "amount"]
-        }
-        
-        for col in df.columns:
-            col_lower = col.lower().strip().replace(" ", "").replace("_", "")
-            for target, terms in mappings.items():
-                if any(term in col_lower for term in terms):
-                    rename_map[col] = target
-                    print(f"Identified '{col}' as {target}")
-        
-        if not rename_map:
-            print("WARNING: Could not identify any standard columns. Using numeric columns.")
-        return df.rename(columns=rename_map)
+    if segment_by and segment_by not in df.columns:
+        print(f"WARNING: Segment column '{segment_by}' not found. Analysing without segments.")
+        segment_by = None
 
-    df = auto_rename_columns(df)
+    # Step 0: Rename columns to expected names
+    df = df.rename(columns=auto_rename_map(df.columns.tolist(), keep=(segment_by,)))
 
     # Find product/item name column
     print("Searching for product name column...")
-    name_column = None
-    
-    # First, try to find columns with specific names
-    name_patterns = ['name', 'product', 'item', 'description', 'title', 'sku', 'model']
-    
+
     # Exclude columns that start with 'Unnamed:'
-    valid_columns = [col for col in df.columns if not col.startswith('Unnamed:')]
-    
-    # If no valid columns, use all columns
-    if not valid_columns:
-        valid_columns = df.columns
-    
+    valid_columns = usable_columns(df.columns.tolist())
+
     # First pass: Look for exact matches in column names
-    for pattern in name_patterns:
-        matches = [col for col in valid_columns if pattern.lower() in col.lower()]
-        if matches:
-            name_column = matches[0]
-            print(f"Found product name column: '{name_column}'")
-            break
+    name_column = find_name_column_by_pattern(valid_columns)
     
     # Second pass: If no match found, look for the first string column that's not an index or unnamed column
     if not name_column:
@@ -116,9 +135,9 @@ try:
         string_columns = []
         
         for col in valid_columns:
-            if df[col].dtype == 'object':  # String columns are 'object' type
+            if df[col].dtype == 'object' or pd.api.types.is_string_dtype(df[col]):
                 # Skip columns that are likely to be indices
-                if col.lower() in ['index', 'id', 'unnamed', '#']:
+                if col.lower() in INDEX_LIKE_COLUMNS:
                     continue
                 
                 # Check if column has unique values (not good for product names)
@@ -200,10 +219,13 @@ try:
     print(f"  Market Growth: {df['MarketGrowth'].name if hasattr(df['MarketGrowth'], 'name') else 'MarketGrowth'}")
     print(f"  Quantity: {df['Quantity'].name if hasattr(df['Quantity'], 'name') else 'Quantity'}")
 
-    # Clean numeric data
+    # Clean numeric data, recovering formatted text such as "12.5%", "Rs 3,400" or "(5.2)"
+    coerced_counts = {}
     for col in ["MarketShare", "MarketGrowth", "Quantity"]:
         try:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            numeric, coerced, _ = to_numeric_tolerant(df[col])
+            df[col] = numeric.fillna(0)
+            coerced_counts[col] = coerced
         except Exception as e:
             print(f"Error converting {col} to numeric: {str(e)}")
             # Create a new column with default values
@@ -230,6 +252,13 @@ try:
             "Quantity": [100, 200, 50],
         })
         df = pd.concat([df, sample_data], ignore_index=True)
+    if segment_by and segment_by not in df.columns:
+        df[segment_by] = np.nan
+
+    # Customer rating and review text columns for the feedback features
+    review_column, rating_column = (
+        find_review_columns(df.columns.tolist(), name_column, segment_by) if analyse_reviews else (None, None)
+    )
 
     # Display data summary
     print("\nData Summary:")
@@ -297,36 +326,198 @@ try:
             print(f"Warning: Only {len(df)} products available for top products list")
             top_products = df
         else:
-            top_products = df.sort_values("Quantity", ascending=False).head(10)
-        
-        top_products_list = []
-        
-        for _, row in top_products.iterrows():
+            # Stable sort so tied quantities keep file order (matches the polars engine)
+            top_products = df.sort_values("Quantity", ascending=False, kind="stable").head(10)
+    except Exception as e:
+        print(f"Error selecting top products: {e}")
+        top_products = None
+
+    category_counts = df['BCG Category'].value_counts().to_dict()
+    segments = None
+
+    def details(reviews=True):
+        """Segment tables (computed once and kept) and, if asked, the review feature tables."""
+        nonlocal segments
+        if segment_by and segments is None:
+            segments = segment_pandas(df, segment_by)
+
+        # Rating and review features per product, per quadrant and per product within each segment,
+        # from one tokenization
+        review_tables = None
+        if reviews and (review_column or rating_column):
+            keys = [name_column, 'BCG Category'] + ([("Segment", name_column)] if segment_by else [])
             try:
-                product_name = str(row[name_column]) if not pd.isna(row[name_column]) else f"Product {_}"
-                product_info = {
-                    "name": product_name[:50],  # Limit name length to avoid issues
-                    "quantity": int(float(row["Quantity"])) if not pd.isna(row["Quantity"]) else 0,
-                    "category": str(row["BCG Category"]),
-                    "market_share": float(row["MarketShare"]) if not pd.isna(row["MarketShare"]) else 0,
-                    "growth_rate": float(row["MarketGrowth"]) if not pd.isna(row["MarketGrowth"]) else 0
-                }
-                top_products_list.append(product_info)
+                review_tables = review_tables_pandas(df, keys, review_column, rating_column)
             except Exception as e:
-                print(f"Error processing product {_}: {str(e)}")
-                # Add a placeholder product
-                top_products_list.append({
-                    "name": f"Product {_}",
-                    "quantity": 0,
-                    "category": "Unknown",
-                    "market_share": 0,
-                    "growth_rate": 0
-                })
+                print(f"Error computing review features: {e}")
+                print(traceback.format_exc())
+        return segments, review_tables
+
+    return df, name_column, share_thresh, growth_thresh, category_counts, top_products, coerced_counts, details
+
+
+def segment_pandas(df, segment_by):
+    """Per-segment thresholds, classification, counts and top products in one grouped pass.
+
+    Adds "Segment" and "Segment Category" columns to df and returns
+    (segment_stats, segment_top): one stats row per segment, sorted by segment,
+    and the top 10 rows by Quantity of every segment.
+    """
+    df["Segment"] = df[segment_by].astype(str).where(df[segment_by].notna(), MISSING_SEGMENT)
+    segment_stats = df.groupby("Segment", sort=True).agg(
+        rows=("MarketShare", "size"),
+        share_thresh=("MarketShare", "median"),
+        growth_thresh=("MarketGrowth", "median"),
+    )
+
+    high_share = df["MarketShare"] >= df["Segment"].map(segment_stats["share_thresh"])
+    high_growth = df["MarketGrowth"] >= df["Segment"].map(segment_stats["growth_thresh"])
+    df["Segment Category"] = np.select(
+        [high_share & high_growth, high_share, high_growth], BCG_CATEGORIES[:3], default="Dog"
+    )
+
+    counts = pd.crosstab(df["Segment"], df["Segment Category"]).reindex(columns=BCG_CATEGORIES, fill_value=0)
+    segment_stats = segment_stats.join(counts)
+    segment_top = df.sort_values("Quantity", ascending=False, kind="stable").groupby("Segment", sort=False).head(10)
+    return segment_stats, segment_top
+
+
+def build_top_products_list(top_products, name_column, category_column="BCG Category", product_reviews=None):
+    top_products_list = []
+    
+    for _, row in top_products.iterrows():
+        try:
+            product_name = str(row[name_column]) if not pd.isna(row[name_column]) else f"Product {_}"
+            product_info = {
+                "name": product_name[:50],  # Limit name length to avoid issues
+                "quantity": int(float(row["Quantity"])) if not pd.isna(row["Quantity"]) else 0,
+                "category": str(row[category_column]),
+                "market_share": float(row["MarketShare"]) if not pd.isna(row["MarketShare"]) else 0,
+                "growth_rate": float(row["MarketGrowth"]) if not pd.isna(row["MarketGrowth"]) else 0
+            }
+            if product_reviews and row[name_column] in product_reviews:
+                product_info["feedback"] = product_reviews[row[name_column]]
+            top_products_list.append(product_info)
+        except Exception as e:
+            print(f"Error processing product {_}: {str(e)}")
+            # Add a placeholder product
+            top_products_list.append({
+                "name": f"Product {_}",
+                "quantity": 0,
+                "category": "Unknown",
+                "market_share": 0,
+                "growth_rate": 0
+            })
+    return top_products_list
+
+
+def build_segment_summaries(segment_stats, segment_top, name_column, segment_reviews=None):
+    """segment_reviews holds the feedback of each listed product within its segment, keyed by (segment, name)."""
+    top_by_segment = dict(list(segment_top.groupby("Segment", sort=False)))
+    reviews_by_segment = {}
+    for (segment, name), features in (segment_reviews or {}).items():
+        reviews_by_segment.setdefault(segment, {})[name] = features
+    segments = []
+    for segment, stats in segment_stats.iterrows():
+        top = top_by_segment.get(segment)
+        product_reviews = reviews_by_segment.get(segment)
+        segments.append({
+            'segment': str(segment),
+            'thresholds': {
+                'market_share': float(stats['share_thresh']),
+                'growth_rate': float(stats['growth_thresh'])
+            },
+            'counts': {
+                'star': int(stats['Star']),
+                'cash_cow': int(stats['Cash Cow']),
+                'question_mark': int(stats['Question Mark']),
+                'dog': int(stats['Dog']),
+                'total': int(stats['rows'])
+            },
+            'top_products': (
+                build_top_products_list(top, name_column, "Segment Category", product_reviews) if top is not None else []
+            )
+        })
+    return segments
+
+
+def build_summary(share_thresh, growth_thresh, category_counts, total, top_products_list, coerced_counts=None):
+    summary = {
+        'thresholds': {
+            'market_share': float(share_thresh),
+            'growth_rate': float(growth_thresh)
+        },
+        'counts': {
+            'star': int(category_counts.get('Star', 0)),
+            'cash_cow': int(category_counts.get('Cash Cow', 0)),
+            'question_mark': int(category_counts.get('Question Mark', 0)),
+            'dog': int(category_counts.get('Dog', 0)),
+            'total': int(total)
+        },
+        'top_products': top_products_list
+    }
+    # Formatted text values ("12.5%", "1,234", "(5.2)") that were parsed rather than read as numbers
+    if coerced_counts and any(coerced_counts.values()):
+        summary['coerced_values'] = {
+            'market_share': int(coerced_counts.get('MarketShare', 0)),
+            'growth_rate': int(coerced_counts.get('MarketGrowth', 0)),
+            'quantity': int(coerced_counts.get('Quantity', 0))
+        }
+    return summary
+
+
+def write_summary(summary, summary_path):
+    """Write the summary JSON atomically: readers see the previous file or the new one, never half of it."""
+    tmp_path = summary_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(summary, f)
+    os.replace(tmp_path, summary_path)
+    print(f"Summary data saved to: {summary_path}")
+
+
+summary_path = output_file_path.replace('.png', '_summary.json')
+summary_written = False
+render_worker = None
+
+
+def stop_on_sigterm(signum, frame):
+    """process_bcg.js kills a run that stops reporting progress: take the render worker down with it."""
+    if render_worker is not None:
+        render_worker.kill()
+    remove_render_payload(output_file_path)
+    sys.exit(128 + signum)
+
+
+signal.signal(signal.SIGTERM, stop_on_sigterm)
+
+try:
+    emit_progress("start", 0)
+    analysis_start = time.perf_counter()
+    if engine == "polars":
+        try:
+            from bcg_polars import run_polars_engine
+            results = run_polars_engine(csv_file_path, segment_by, analyse_reviews)
+        except Exception as e:
+            print(f"Polars engine failed ({str(e)}). Falling back to pandas engine.")
+            results = run_pandas_engine(csv_file_path, segment_by, analyse_reviews)
+    else:
+        results = run_pandas_engine(csv_file_path, segment_by, analyse_reviews)
+    df, name_column, share_thresh, growth_thresh, category_counts, top_products, coerced_counts, details = results
+    print(f"\nAnalysis time ({engine} engine): {time.perf_counter() - analysis_start:.3f}s")
+    emit_progress("classified", 50, rows=len(df))
+
+    # Build top products list
+    try:
+        if top_products is None:
+            raise ValueError("No top products were selected")
+
+        top_products_list = build_top_products_list(top_products, name_column)
         
         print(f"\nTop {len(top_products_list)} products by quantity identified")
     except Exception as e:
         print(f"Error extracting top products: {e}")
         print(traceback.format_exc())
+        top_products = None
         # Create sample top products
         top_products_list = [
             {"name": "Sample Product 1", "quantity": 100, "category": "Star", "market_share": 8, "growth_rate": 15},
@@ -336,7 +527,6 @@ try:
         ]
 
     # Print classification counts
-    category_counts = df['BCG Category'].value_counts().to_dict()
     print("\nBCG Classification Results:")
     print(f"  Stars: {category_counts.get('Star', 0)}")
     print(f"  Cash Cows: {category_counts.get('Cash Cow', 0)}")
@@ -344,212 +534,167 @@ try:
     print(f"  Dogs: {category_counts.get('Dog', 0)}")
     print(f"  Total Products: {len(df)}")
 
-    # Step 3: Plot BCG Matrix with improved styling
+    # Thresholds, counts and top products are final once classification is done: publish them
+    # before segments, review features and rendering so a caller that stops waiting still has the numbers
     try:
-        plt.figure(figsize=(12, 8))
-        plt.style.use('seaborn-v0_8-whitegrid')
-
-        # Create scatter plot
-        scatter = sns.scatterplot(
-            data=df,
-            x="MarketShare", 
-            y="MarketGrowth",
-            hue="BCG Category", 
-            style="BCG Category", 
-            s=150,
-            alpha=0.8,
-            palette={
-                "Star": "#FFD700",      # Gold
-                "Cash Cow": "#32CD32",  # Lime Green
-                "Question Mark": "#1E90FF", # Dodger Blue
-                "Dog": "#FF6347"        # Tomato
-            }
-        )
+        summary = build_summary(share_thresh, growth_thresh, category_counts, len(df), top_products_list, coerced_counts)
+        write_summary(dict(summary, partial=True), summary_path)
+        summary_written = True
+        emit_progress("summary", 60, rows=len(df), path=summary_path, partial=True)
+    except Exception as e:
+        print(f"Error writing early summary: {e}")
+        print(traceback.format_exc())
 
-        # Add product names as labels with limit to prevent overcrowding
-        max_labels = min(15, len(df))
-        for idx, row in df.head(max_labels).iterrows():
-            try:
-                label = str(row[name_column]) if not pd.isna(row[name_column]) else f"Product {idx}"
-                label = label[:15] + '...' if len(label) > 15 else label
-                plt.annotate(
-                    label,
-                    xy=(row['MarketShare'], row['MarketGrowth']),
-                    xytext=(5, 5),
-                    textcoords='offset points',
-                    fontsize=8
-                )
-            except Exception as e:
-                print(f"Error annotating label for row {idx}: {e}")
+    # The small-multiples grid is drawn from the per-segment classification, so it comes first
+    segment_stats = None
+    if segment_by and segment_render == "grid":
+        segments, _ = details(reviews=False)
+        segment_stats = segments[0] if segments is not None else None
 
-        # Get axis limits with error handling
-        try:
-            x_min = float(df['MarketShare'].min()) if not pd.isna(df['MarketShare'].min()) else 0
-            x_max = float(df['MarketShare'].max()) if not pd.isna(df['MarketShare'].max()) else 10
-            y_min = float(df['MarketGrowth'].min()) if not pd.isna(df['MarketGrowth'].min()) else 0
-            y_max = float(df['MarketGrowth'].max()) if not pd.isna(df['MarketGrowth'].max()) else 10
-            
-            # Ensure we have valid ranges
-            if x_min >= x_max:
-                x_min = 0
-                x_max = 10
-            if y_min >= y_max:
-                y_min = 0
-                y_max = 10
-                
-            # Add some padding
-            x_range = x_max - x_min
-            y_range = y_max - y_min
-            x_min -= x_range * 0.1
-            x_max += x_range * 0.1
-            y_min -= y_range * 0.1
-            y_max += y_range * 0.1
-            
-            plt.xlim(x_min, x_max)
-            plt.ylim(y_min, y_max)
-        except Exception as e:
-            print(f"Error setting axis limits: {e}")
-            # Use default limits
-            plt.xlim(0, 10)
-            plt.ylim(0, 10)
+    # Step 3: Plot BCG Matrix in a separate worker while the rest of the summary is built
+    render_payload = None
+    try:
+        render_payload = build_render_payload(df, name_column, share_thresh, growth_thresh, segment_by, segment_stats)
+        render_worker = start_render_worker(render_payload, output_file_path)
+        emit_progress("rendering", 65, rows=len(df))
+    except Exception as e:
+        print(f"Could not start render worker ({e}). Rendering after the summary instead.")
 
-        # Add quadrant lines
-        plt.axvline(x=share_thresh, color='grey', linestyle='--', alpha=0.6)
-        plt.axhline(y=growth_thresh, color='grey', linestyle='--', alpha=0.6)
+    # Per-segment tables and review features, computed while the image renders
+    segments, review_tables = details()
+    segment_stats, segment_top = segments if segments is not None else (None, None)
+    if segment_stats is not None:
+        print(f"\nSegments by {segment_by}: {len(segment_stats)}")
+        for segment, stats in segment_stats.iterrows():
+            print(
+                f"  {segment}: Stars={int(stats['Star'])}, Cash Cows={int(stats['Cash Cow'])}, "
+                f"Question Marks={int(stats['Question Mark'])}, Dogs={int(stats['Dog'])}, Total={int(stats['rows'])}"
+            )
+    emit_progress("features", 75, rows=len(df))
 
-        # Add quadrant labels with safe positioning
+    # Customer feedback for the products and quadrants that end up in the summary
+    product_reviews = {}
+    segment_reviews = {}
+    quadrant_reviews = None
+    if review_tables is not None:
         try:
-            plt.text(x_max*0.75, y_max*0.9, 'STARS', fontsize=14, fontweight='bold', color='#FFD700')
-            plt.text(x_max*0.75, y_min*0.9, 'CASH COWS', fontsize=14, fontweight='bold', color='#32CD32')
-            plt.text(x_min*1.1, y_max*0.9, 'QUESTION MARKS', fontsize=14, fontweight='bold', color='#1E90FF')
-            plt.text(x_min*1.1, y_min*0.9, 'DOGS', fontsize=14, fontweight='bold', color='#FF6347')
+            listed = [] if top_products is None else top_products[name_column].tolist()
+            product_reviews = review_summaries(*review_tables[name_column], listed)
+            quadrant_reviews = review_summaries(*review_tables['BCG Category'], BCG_CATEGORIES)
+            if segment_top is not None:
+                # Segment top products carry the feedback from their own segment's rows only
+                listed_in_segment = list(zip(segment_top["Segment"], segment_top[name_column]))
+                segment_reviews = review_summaries(*review_tables[("Segment", name_column)], listed_in_segment)
+            print(f"Review features computed for {len(product_reviews) + len(segment_reviews)} listed products")
         except Exception as e:
-            print(f"Error adding quadrant labels: {e}")
-
-        # Styling
-        plt.title("BCG Matrix Analysis", fontsize=16, fontweight='bold')
-        plt.xlabel(f"Market Share (Threshold: {share_thresh:.2f})", fontsize=12)
-        plt.ylabel(f"Market Growth Rate (Threshold: {growth_thresh:.2f})", fontsize=12)
-        plt.legend(title="Categories", fontsize=10, title_fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-
-        # Save the figure
-        output_dir = os.path.dirname(output_file_path)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            
-        plt.savefig(output_file_path, dpi=300, bbox_inches='tight')
-        print(f"\nBCG Matrix visualization saved to: {output_file_path}")
+            print(f"Error summarising review features: {e}")
+            print(traceback.format_exc())
+
+    # Generate the complete summary
+    try:
+        if top_products is not None and product_reviews:
+            top_products_list = build_top_products_list(top_products, name_column, product_reviews=product_reviews)
+        summary = build_summary(share_thresh, growth_thresh, category_counts, len(df), top_products_list, coerced_counts)
+        if quadrant_reviews is not None:
+            summary['quadrants'] = {
+                'star': quadrant_reviews.get('Star'),
+                'cash_cow': quadrant_reviews.get('Cash Cow'),
+                'question_mark': quadrant_reviews.get('Question Mark'),
+                'dog': quadrant_reviews.get('Dog')
+            }
+        if segment_stats is not None:
+            try:
+                summary['segment_by'] = segment_by
+                summary['segments'] = build_segment_summaries(segment_stats, segment_top, name_column, segment_reviews)
+            except Exception as e:
+                print(f"Error building segment summaries: {e}")
+                print(traceback.format_exc())
+
+        write_summary(summary, summary_path)
+        summary_written = True
+        emit_progress("summary", 85, rows=len(df), path=summary_path, partial=False)
     except Exception as e:
-        print(f"Error creating BCG Matrix plot: {e}")
+        print(f"Error generating summary: {e}")
         print(traceback.format_exc())
+
+        if not summary_written:
+            # Create a default summary
+            default_summary = {
+                'thresholds': {
+                    'market_share': 5.0,
+                    'growth_rate': 5.0
+                },
+                'counts': {
+                    'star': 1,
+                    'cash_cow': 1,
+                    'question_mark': 1,
+                    'dog': 1,
+                    'total': 4
+                },
+                'top_products': top_products_list if top_products_list else [
+                    {"name": "Sample Product 1", "quantity": 100, "category": "Star", "market_share": 8, "growth_rate": 15},
+                    {"name": "Sample Product 2", "quantity": 80, "category": "Cash Cow", "market_share": 12, "growth_rate": 5},
+                    {"name": "Sample Product 3", "quantity": 60, "category": "Question Mark", "market_share": 3, "growth_rate": 20},
+                    {"name": "Sample Product 4", "quantity": 40, "category": "Dog", "market_share": 5, "growth_rate": -2}
+                ]
+            }
+            write_summary(default_summary, summary_path)
+            summary_written = True
+            emit_progress("summary", 85, rows=len(df), path=summary_path, partial=False)
+
+    # Wait for the image
+    rendered = False
+    if render_worker is not None:
+        rendered = render_worker.wait() == 0
+        render_worker = None
+        remove_render_payload(output_file_path)
+    elif render_payload is not None:
+        try:
+            render(render_payload, output_file_path)
+            rendered = True
+        except Exception as e:
+            print(f"Error creating BCG Matrix plot: {e}")
+            print(traceback.format_exc())
+
+    if not rendered:
         # Create a simple fallback plot
         try:
-            plt.figure(figsize=(12, 8))
-            plt.text(0.5, 0.5, "Error generating BCG Matrix\nPlease check your data", 
-                    horizontalalignment='center', fontsize=20)
-            plt.axis('off')
-            plt.savefig(output_file_path, dpi=300, bbox_inches='tight')
+            plot_error_image(output_file_path, "Error generating BCG Matrix\nPlease check your data")
             print(f"Created fallback image at: {output_file_path}")
         except Exception as e2:
             print(f"Error creating fallback plot: {e2}")
             # If all else fails, create an empty file
             with open(output_file_path, 'w') as f:
                 f.write('')
+    emit_progress("rendered", 95, rows=len(df), path=output_file_path)
 
-    # Generate summary statistics
-    try:
-        # Get category counts with error handling
-        category_counts = df['BCG Category'].value_counts().to_dict()
-        
-        # Print classification counts
-        print("\nBCG Classification Results:")
-        print(f"  Stars: {category_counts.get('Star', 0)}")
-        print(f"  Cash Cows: {category_counts.get('Cash Cow', 0)}")
-        print(f"  Question Marks: {category_counts.get('Question Mark', 0)}")
-        print(f"  Dogs: {category_counts.get('Dog', 0)}")
-        print(f"  Total Products: {len(df)}")
-        
-        summary = {
-            'thresholds': {
-                'market_share': float(share_thresh),
-                'growth_rate': float(growth_thresh)
-            },
-            'counts': {
-                'star': int(category_counts.get('Star', 0)),
-                'cash_cow': int(category_counts.get('Cash Cow', 0)),
-                'question_mark': int(category_counts.get('Question Mark', 0)),
-                'dog': int(category_counts.get('Dog', 0)),
-                'total': int(len(df))
-            },
-            'top_products': top_products_list
-        }
-
-        # Write summary to file
-        summary_path = output_file_path.replace('.png', '_summary.json')
-        with open(summary_path, 'w') as f:
-            json.dump(summary, f)
-        print(f"Summary data saved to: {summary_path}")
+    print("\nAnalysis complete. Ready for AI processing.")
+    emit_progress("done", 100, rows=len(df))
 
-        print("\nAnalysis complete. Ready for AI processing.")
-    except Exception as e:
-        print(f"Error generating summary: {e}")
-        print(traceback.format_exc())
-        
-        # Create a default summary
-        default_summary = {
-            'thresholds': {
-                'market_share': 5.0,
-                'growth_rate': 5.0
-            },
-            'counts': {
-                'star': 1,
-                'cash_cow': 1,
-                'question_mark': 1,
-                'dog': 1,
-                'total': 4
-            },
-            'top_products': top_products_list if top_products_list else [
-                {"name": "Sample Product 1", "quantity": 100, "category": "Star", "market_share": 8, "growth_rate": 15},
-                {"name": "Sample Product 2", "quantity": 80, "category": "Cash Cow", "market_share": 12, "growth_rate": 5},
-                {"name": "Sample Product 3", "quantity": 60, "category": "Question Mark", "market_share": 3, "growth_rate": 20},
-                {"name": "Sample Product 4", "quantity": 40, "category": "Dog", "market_share": 5, "growth_rate": -2}
-            ]
-        }
-        
-        # Write default summary to file
-        summary_path = output_file_path.replace('.png', '_summary.json')
-        with open(summary_path, 'w') as f:
-            json.dump(default_summary, f)
-        print(f"Default summary data saved to: {summary_path}")
-        
 except Exception as e:
     print(f"ERROR: An unhandled exception occurred: {str(e)}")
     print(traceback.format_exc())
     
     # Try to create minimal output files to prevent complete failure
     try:
+        if render_worker is not None:
+            render_worker.kill()
+        remove_render_payload(output_file_path)
+
         # Create a simple error image
-        plt.figure(figsize=(12, 8))
-        plt.text(0.5, 0.5, f"Error: {str(e)}\n\nPlease check your data", 
-                horizontalalignment='center', fontsize=20)
-        plt.axis('off')
-        plt.savefig(output_file_path, dpi=300, bbox_inches='tight')
-        
-        # Create a minimal summary
-        minimal_summary = {
-            'thresholds': {'market_share': 5.0, 'growth_rate': 5.0},
-            'counts': {'star': 0, 'cash_cow': 0, 'question_mark': 0, 'dog': 0, 'total': 0},
-            'top_products': [],
-            'error': str(e)
-        }
-        
-        # Write minimal summary to file
-        summary_path = output_file_path.replace('.png', '_summary.json')
-        with open(summary_path, 'w') as f:
-            json.dump(minimal_summary, f)
+        plot_error_image(output_file_path, f"Error: {str(e)}\n\nPlease check your data")
+
+        # Keep the numbers if they were already published
+        if not summary_written:
+            # Create a minimal summary
+            minimal_summary = {
+                'thresholds': {'market_share': 5.0, 'growth_rate': 5.0},
+                'counts': {'star': 0, 'cash_cow': 0, 'question_mark': 0, 'dog': 0, 'total': 0},
+                'top_products': [],
+                'error': str(e)
+            }
+            write_summary(minimal_summary, summary_path)
     except:
         pass
         
-    sys.exit(1) 
\ No newline at end of file
+    sys.exit(1)
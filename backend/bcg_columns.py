@@ -0,0 +1,90 @@
+"""
+Column detection and labels shared by the pandas and polars engines of ball.py.
+
+Everything here works on plain lists of column names so both engines resolve
+the same input to the same MarketShare / MarketGrowth / Quantity / name columns.
+"""
+
+BCG_CATEGORIES = ["Star", "Cash Cow", "Question Mark", "Dog"]
+
+# Segment label used for rows with no value in the --segment-by column
+MISSING_SEGMENT = "(missing)"
+
+# Column name mappings
+COLUMN_MAPPINGS = {
+    "MarketShare": ["share", "marketshare", "sharerate", "market_share", "marketvalue"],
+    "MarketGrowth": ["growth", "marketgrowth", "growthrate", "growth_rate", "marketgrowthrate"],
+    "Quantity": ["quantity", "count", "units", "sold", "qty", "volume", "amount"]
+}
+
+# Substrings that mark a product/item name column
+NAME_PATTERNS = ['name', 'product', 'item', 'description', 'title', 'sku', 'model']
+
+# String columns that are likely to be indices rather than product names
+INDEX_LIKE_COLUMNS = ['index', 'id', 'unnamed', '#']
+
+# Substrings that mark customer rating and review text columns
+RATING_PATTERNS = ['rating', 'stars']
+REVIEW_PATTERNS = ['review', 'comment', 'feedback']
+
+
+def auto_rename_map(columns, keep=()):
+    """Map source column names onto MarketShare / MarketGrowth / Quantity.
+
+    Each target is claimed by at most one column (a column already carrying the
+    target name wins, otherwise the first match), so loose terms like "count"
+    cannot turn a later "Country" column into a second Quantity column.
+    Columns in `keep` (e.g. the --segment-by column) are never renamed.
+    """
+    rename_map = {}
+    print("Attempting to identify important columns...")
+
+    claimed = {col for col in columns if col in COLUMN_MAPPINGS}
+    for col in columns:
+        if col in COLUMN_MAPPINGS:
+            print(f"Identified '{col}' as {col}")
+            continue
+        if col in keep:
+            continue
+        col_lower = col.lower().strip().replace(" ", "").replace("_", "")
+        for target, terms in COLUMN_MAPPINGS.items():
+            if target not in claimed and any(term in col_lower for term in terms):
+                rename_map[col] = target
+                claimed.add(target)
+                print(f"Identified '{col}' as {target}")
+                break
+
+    if not rename_map and not claimed:
+        print("WARNING: Could not identify any standard columns. Using numeric columns.")
+    return rename_map
+
+
+def usable_columns(columns):
+    """Columns eligible as the product name column (pandas 'Unnamed:' index columns excluded)."""
+    valid_columns = [col for col in columns if not col.startswith('Unnamed:')]
+
+    # If no valid columns, use all columns
+    if not valid_columns:
+        valid_columns = list(columns)
+    return valid_columns
+
+
+def find_name_column_by_pattern(columns):
+    """First pass of the product name search: match on well-known column names."""
+    valid_columns = usable_columns(columns)
+    for pattern in NAME_PATTERNS:
+        matches = [col for col in valid_columns if pattern.lower() in col.lower()]
+        if matches:
+            print(f"Found product name column: '{matches[0]}'")
+            return matches[0]
+    return None
+
+
+def find_column_by_pattern(columns, patterns, exclude=()):
+    """First column whose name contains one of `patterns`, skipping analysis columns."""
+    for col in columns:
+        if col in COLUMN_MAPPINGS or col in exclude:
+            continue
+        if any(pattern in col.lower() for pattern in patterns):
+            return col
+    return None
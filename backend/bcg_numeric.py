@@ -0,0 +1,116 @@
+"""
+Tolerant parsing of numeric columns exported as text, shared by both engines of ball.py.
+
+Values a plain numeric parse rejects ("12.5%", "1,234", "Rs 3,400", "(5.2)",
+"1.234,5") are cleaned with string operations on the whole column at once:
+- accounting parentheses and a minus before the first digit make the value negative
+- currency symbols, codes, "%", spaces and other text are dropped
+- thousands separators are removed and the decimal separator becomes "."
+
+Whether "," or "." is the decimal separator (detect_decimal_comma) and whether
+the column holds percentages to divide by 100 (detect_percent) are decided once
+per column from a sample, so "1.234" or "12.5" mean the same thing in every row.
+"""
+import pandas as pd
+
+# Values looked at to detect a column's number format
+FORMAT_SAMPLE_SIZE = 1000
+
+# Patterns use [0-9] rather than \d so Python and Polars (Rust) regexes match the same digits.
+# After dropping everything but digits and separators:
+# decimal comma, e.g. "1.234,5", "12,5" or "0,125" (three digits after a lone comma read as
+# thousands, unless the group before it is 0, which is never a thousands group)
+DECIMAL_COMMA_PATTERN = r"[0-9]{1,3}(?:\.[0-9]{3})+,[0-9]+|[0-9]+,(?:[0-9]{1,2}|[0-9]{4,})|0,[0-9]+"
+# decimal point, e.g. "1,234.5", "12.5" or "0.125"
+DECIMAL_POINT_PATTERN = r"[0-9]{1,3}(?:,[0-9]{3})+\.[0-9]+|[0-9]+\.(?:[0-9]{1,2}|[0-9]{4,})|0\.[0-9]+"
+
+NEGATIVE_PATTERN = r"^\s*\(.*\)\s*$|^[^0-9]*[-−]"
+NUMBER_CHARS_PATTERN = r"[^0-9.,]+"
+NUMBER_PATTERN = r"[0-9]+(?:\.[0-9]*)?|\.[0-9]+"
+
+
+def detect_decimal_comma(sample):
+    """True if most unambiguous values in `sample` (strings) use a decimal comma."""
+    body = sample.astype(str).str.replace(NUMBER_CHARS_PATTERN, "", regex=True).str.strip(".,")
+    decimal_comma = int(body.str.fullmatch(DECIMAL_COMMA_PATTERN).sum())
+    decimal_point = int(body.str.fullmatch(DECIMAL_POINT_PATTERN).sum())
+    return decimal_comma > decimal_point
+
+
+def detect_percent(sample):
+    """True if most values in `sample` (strings) carry a "%" sign."""
+    marked = int(sample.astype(str).str.contains("%", regex=False).sum())
+    return marked * 2 > len(sample)
+
+
+def parse_numeric(values, decimal_comma=False, percent=False):
+    """Tolerant parse of a string Series; NaN where no number can be recovered."""
+    # Exports repeat the same strings a lot: parse each distinct value once
+    codes, uniques = pd.factorize(values)
+    if len(uniques) < len(values):
+        parsed = parse_numeric(pd.Series(uniques, dtype=object), decimal_comma, percent).to_numpy()
+        return pd.Series(parsed[codes], index=values.index)
+
+    values = values.astype(str)
+    negative = values.str.contains(NEGATIVE_PATTERN, regex=True)
+
+    body = values.str.replace(NUMBER_CHARS_PATTERN, "", regex=True).str.strip(".,")
+    if decimal_comma:
+        body = body.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    else:
+        body = body.str.replace(",", "", regex=False)
+
+    valid = body.str.fullmatch(NUMBER_PATTERN).astype(bool)
+    if percent:
+        # Scaled in the text ("12.5e-2") so the result is the correctly rounded decimal,
+        # the same in both engines, rather than a float division
+        body = body + "e-2"
+    number = pd.Series(float("nan"), index=values.index)
+    number[valid] = body[valid].astype("float64")
+    return number.where(~negative, -number)
+
+
+def report_coerced(column, coerced, unparsed, decimal_comma, percent=False):
+    if coerced or unparsed:
+        number_format = f"decimal {'comma' if decimal_comma else 'point'}{', percent' if percent else ''}"
+        print(
+            f"  {column}: parsed {coerced} formatted text values ({number_format}), "
+            f"{unparsed} unreadable values set to 0"
+        )
+
+
+def to_numeric_tolerant(series):
+    """pd.to_numeric(errors='coerce') with a tolerant pass for text values.
+
+    In a decimal-comma or percent column every value takes the tolerant parse,
+    since a plain-looking "1.234" is a thousands-separated 1234 there and "12.5"
+    is 12.5%. Otherwise only the values pd.to_numeric rejects do, and a stray
+    "%" is ignored rather than scaling a few values by 100.
+
+    Returns (values, coerced, unparsed): the float Series (NaN where nothing
+    could be parsed), the number of values the tolerant pass read and the
+    number of non-empty values it could not read.
+    """
+    numeric = pd.to_numeric(series, errors='coerce')
+    if pd.api.types.is_numeric_dtype(series):
+        return numeric, 0, 0
+
+    numeric = numeric.astype('float64')
+    sample = series.dropna().head(FORMAT_SAMPLE_SIZE)
+    decimal_comma = detect_decimal_comma(sample)
+    percent = detect_percent(sample)
+    if decimal_comma or percent:
+        tolerant = series.notna()
+    else:
+        # pandas' string converter can be one ulp off; re-parse accepted values exactly
+        parsed = numeric.notna()
+        numeric[parsed] = series[parsed].astype(str).astype('float64')
+        tolerant = series.notna() & ~parsed
+    if not tolerant.any():
+        return numeric, 0, 0
+
+    numeric[tolerant] = parse_numeric(series[tolerant], decimal_comma, percent)
+    coerced = int(numeric[tolerant].notna().sum())
+    unparsed = int(tolerant.sum()) - coerced
+    report_coerced(series.name, coerced, unparsed, decimal_comma, percent)
+    return numeric, coerced, unparsed
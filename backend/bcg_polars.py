@@ -0,0 +1,514 @@
+"""
+Polars engine for ball.py (``--engine polars``).
+
+Runs ingest, cleaning, thresholds, classification, counts and top-K as lazy
+Polars queries on all cores. The CSV is read in two passes: a profile query
+for what column detection needs (row count, name and quantity checks, number
+format samples), then the analysis, where only the columns it touches are
+parsed (projection pushdown) and one collect_all shares a single scan.
+Segment and review tables run later on the classified frame kept in memory. Each step
+mirrors run_pandas_engine() in ball.py, so both engines write the same
+_summary.json for the same input.
+"""
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from bcg_columns import (
+    BCG_CATEGORIES, INDEX_LIKE_COLUMNS, MISSING_SEGMENT, auto_rename_map, find_name_column_by_pattern, usable_columns
+)
+from bcg_numeric import (
+    FORMAT_SAMPLE_SIZE, NEGATIVE_PATTERN, NUMBER_CHARS_PATTERN, detect_decimal_comma, detect_percent, report_coerced
+)
+from bcg_progress import emit_progress
+from bcg_reviews import (
+    ISSUE_TERMS, NEGATORS, SENTIMENT_LEXICON, TOKEN_PATTERN, TOP_TERMS, find_review_columns, key_columns
+)
+
+# Strings pandas.read_csv treats as missing by default
+PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+]
+
+VALUE_COLUMNS = ["MarketShare", "MarketGrowth", "Quantity"]
+
+
+def scan_csv(csv_file_path, infer_schema_length=10000, text_columns=()):
+    """Lazily scan a CSV with pandas-compatible missing values and header names.
+
+    Columns in `text_columns` are read as strings whatever they contain.
+    """
+    lf = pl.scan_csv(
+        csv_file_path, null_values=PANDAS_NA_VALUES, infer_schema_length=infer_schema_length,
+        schema_overrides={col: pl.String for col in text_columns}
+    )
+
+    # pandas labels blank headers (e.g. a saved index) as "Unnamed: <position>"
+    columns = lf.collect_schema().names()
+    blank_headers = {col: f"Unnamed: {i}" for i, col in enumerate(columns) if not col.strip()}
+    return lf.rename(blank_headers) if blank_headers else lf
+
+
+def parse_numeric(col, decimal_comma=False, percent=False):
+    """Polars form of bcg_numeric.parse_numeric() for a String column."""
+    text = pl.col(col)
+    body = text.str.replace_all(NUMBER_CHARS_PATTERN, "").str.strip_chars(".,")
+    if decimal_comma:
+        body = body.str.replace_all(".", "", literal=True).str.replace_all(",", ".", literal=True)
+    else:
+        body = body.str.replace_all(",", "", literal=True)
+
+    if percent:
+        body = body + "e-2"
+
+    # body holds only digits, inner separators and the exponent, so the cast is null exactly where
+    # NUMBER_PATTERN fails
+    number = body.cast(pl.Float64, strict=False)
+    return pl.when(text.str.contains(NEGATIVE_PATTERN)).then(-number).otherwise(number)
+
+
+def to_numeric(col, dtype, fill=0, decimal_comma=None, percent=False):
+    """Equivalent of pd.to_numeric(errors='coerce').fillna(fill) as a Polars expression.
+
+    With decimal_comma set, String values get the tolerant parse of
+    bcg_numeric.to_numeric_tolerant(): all of them in a decimal-comma or
+    percent column, otherwise those the plain cast rejects.
+    """
+    if dtype.is_numeric():
+        expr = pl.col(col)
+    elif dtype == pl.String:
+        expr = pl.col(col).str.strip_chars().cast(pl.Float64, strict=False)
+        if decimal_comma or percent:
+            expr = parse_numeric(col, decimal_comma, percent)
+        elif decimal_comma is not None:
+            expr = pl.coalesce(expr, parse_numeric(col, decimal_comma))
+    else:
+        expr = pl.col(col).cast(pl.Float64, strict=False)
+    return expr.fill_null(fill) if fill is not None else expr
+
+
+def classify_bcg(share_thresh, growth_thresh, alias="BCG Category"):
+    """Vectorized form of the row-wise BCG classification in ball.py."""
+    high_share = pl.col("MarketShare") >= share_thresh
+    high_growth = pl.col("MarketGrowth") >= growth_thresh
+    return (
+        pl.when(high_share & high_growth).then(pl.lit("Star"))
+        .when(high_share).then(pl.lit("Cash Cow"))
+        .when(high_growth).then(pl.lit("Question Mark"))
+        .otherwise(pl.lit("Dog"))
+        .alias(alias)
+    )
+
+
+def median(col):
+    # numpy/pandas average the two middle values; Polars' default median interpolates instead
+    return pl.col(col).quantile(0.5, interpolation="midpoint")
+
+
+def to_pandas(frame, columns, index=None):
+    """Build a pandas DataFrame without going through pyarrow."""
+    data = {col: frame[col].to_numpy() for col in columns}
+    return pd.DataFrame(data, index=index)
+
+
+def review_queries(rows, keys, review_column=None, rating_column=None):
+    """Lazy (stats, terms) queries per key, the Polars form of review_tables_pandas()."""
+    features = rows.select(
+        ["__row"] + list(dict.fromkeys(col for key in keys for col in key_columns(key)))
+        + ([pl.col(rating_column).alias("rating")] if rating_column else [])
+        + ([pl.col(review_column).is_not_null().alias("reviewed")] if review_column else [])
+    )
+
+    if review_column:
+        # One token per row: row id of the review, token text
+        tokens = (
+            rows.filter(pl.col(review_column).is_not_null())
+            .select(
+                "__row",
+                pl.col(review_column).str.to_lowercase()
+                .str.replace_all("’", "'", literal=True)
+                .str.extract_all(TOKEN_PATTERN)
+                .alias("token"),
+            )
+            .explode("token")
+            .drop_nulls("token")
+            .with_columns(
+                ((pl.col("__row").shift(1) == pl.col("__row")) & pl.col("token").shift(1).is_in(NEGATORS))
+                .fill_null(False).alias("negated"),
+                pl.col("token").replace_strict(SENTIMENT_LEXICON, default=None, return_dtype=pl.Float64).alias("weight"),
+            )
+            .with_columns(pl.when(pl.col("negated")).then(-pl.col("weight")).otherwise(pl.col("weight")).alias("weight"))
+        )
+        per_review = tokens.group_by("__row").agg(
+            [pl.col("weight").sum().clip(-1, 1).alias("sentiment")]
+            + [
+                (pl.col("token").is_in(terms) & ~pl.col("negated")).any().alias(f"issue_{issue}")
+                for issue, terms in ISSUE_TERMS.items()
+            ]
+        )
+        features = features.join(per_review, on="__row", how="left").with_columns(
+            [pl.when(pl.col("reviewed")).then(pl.col("sentiment").fill_null(0.0)).alias("sentiment")]
+            + [pl.col(f"issue_{issue}").fill_null(False) for issue in ISSUE_TERMS]
+        )
+        matched = tokens.filter(pl.col("weight").is_not_null() & (pl.col("weight") != 0)).select(
+            "__row",
+            pl.when(pl.col("weight") > 0).then(pl.lit("praise")).otherwise(pl.lit("complaint")).alias("polarity"),
+            pl.when(pl.col("negated")).then(pl.lit("not ") + pl.col("token")).otherwise(pl.col("token")).alias("term"),
+        )
+        # Tokenize once: every key's aggregation below reads these two frames
+        features, matched = [frame.lazy() for frame in pl.collect_all([features, matched])]
+
+    queries = []
+    for key in keys:
+        columns = key_columns(key)
+        has_key = pl.all_horizontal([pl.col(col).is_not_null() for col in columns])
+        aggs = []
+        if rating_column:
+            aggs += [
+                pl.col("rating").count().alias("rating_count"),
+                pl.col("rating").sum().alias("rating_sum"),
+                pl.col("rating").min().alias("rating_min"),
+                pl.col("rating").max().alias("rating_max"),
+            ]
+        terms = None
+        if review_column:
+            aggs += [pl.col("reviewed").sum().alias("reviews"), pl.col("sentiment").mean().alias("sentiment")]
+            aggs += [pl.col(f"issue_{issue}").sum() for issue in ISSUE_TERMS]
+            terms = (
+                matched.join(features.select(["__row"] + columns), on="__row", how="left")
+                .filter(has_key)
+                .group_by(columns + ["polarity", "term"]).agg(pl.len().alias("count"))
+                .sort(["count", "term"], descending=[True, False])
+                .group_by(columns + ["polarity"], maintain_order=True)
+                .head(TOP_TERMS)
+            )
+        queries.append((features.filter(has_key).group_by(columns).agg(aggs), terms))
+    return queries
+
+
+def key_values(frame, key):
+    """Values of a review table key as pandas groups them: scalars, or tuples for a tuple key."""
+    values = [frame[col].to_list() for col in key_columns(key)]
+    return list(zip(*values)) if isinstance(key, tuple) else values[0]
+
+
+def run_polars_engine(csv_file_path, segment_by=None, analyse_reviews=True):
+    """Run the analysis with Polars.
+
+    Returns the same tuple as run_pandas_engine(): a pandas DataFrame with the
+    name, value and category columns for plotting, the name column, both
+    thresholds, the category counts, the top products by quantity, the number
+    of formatted text values parsed per value column, and details(reviews=True).
+    details() returns, with segment_by, the (segment_stats, segment_top) pair of
+    segment_pandas() and the review_tables_pandas() tables when the file has
+    rating or review columns; ball.py calls it after the partial summary is out.
+    """
+    try:
+        return _run(csv_file_path, 10000, segment_by, analyse_reviews)
+    except pl.exceptions.ComputeError as e:
+        # A value late in the file did not fit the inferred column type
+        print(f"Schema inference on the first rows was not enough ({str(e).splitlines()[0]}). Rescanning full file...")
+        return _run(csv_file_path, None, segment_by, analyse_reviews)
+
+
+def _run(csv_file_path, infer_schema_length, segment_by, analyse_reviews):
+    print(f"Scanning CSV file with polars...")
+    # Segment labels come from the source text, as in the pandas engine
+    lf = scan_csv(csv_file_path, infer_schema_length, [segment_by] if segment_by else ())
+    print(f"Column names: {lf.collect_schema().names()}")
+
+    if segment_by and segment_by not in lf.collect_schema():
+        print(f"WARNING: Segment column '{segment_by}' not found. Analysing without segments.")
+        segment_by = None
+
+    # Step 0: Rename columns to expected names
+    lf = lf.rename(auto_rename_map(lf.collect_schema().names(), keep=(segment_by,)))
+    schema = lf.collect_schema()
+
+    # Find product/item name column
+    print("Searching for product name column...")
+    valid_columns = usable_columns(schema.names())
+    name_column = find_name_column_by_pattern(valid_columns)
+    name_candidates = [] if name_column else [
+        col for col in valid_columns
+        if schema[col] == pl.String and col.lower() not in INDEX_LIKE_COLUMNS
+    ]
+    quantity_candidates = [] if "Quantity" in schema else [
+        col for col, dtype in schema.items() if dtype.is_numeric() and col not in ["MarketShare", "MarketGrowth"]
+    ]
+    text_columns = [col for col in VALUE_COLUMNS if col in schema and schema[col] == pl.String]
+
+    # Everything the column choices below read from the data, in one pass before the analysis pass:
+    # row count, unique names per name candidate, quantity checks and number format samples
+    profile = lf.select(
+        [pl.len().alias("__rows")]
+        + [pl.col(col).drop_nulls().n_unique().alias(f"__unique_{col}") for col in name_candidates]
+        + [
+            # Checks on every quantity candidate: non-empty, no negatives or gaps, mean > 1
+            pl.struct(
+                (pl.col(col).drop_nulls().len() > 0).alias("non_empty"),
+                ((pl.col(col).null_count() == 0) & (pl.col(col) >= 0).all()).alias("non_negative"),
+                pl.col(col).mean().alias("mean"),
+            ).alias(f"__quantity_{col}")
+            for col in quantity_candidates
+        ]
+        + [
+            # First non-empty values, as in bcg_numeric
+            pl.col(col).drop_nulls().head(FORMAT_SAMPLE_SIZE).implode().alias(f"__sample_{col}")
+            for col in text_columns
+        ]
+    ).collect().row(0, named=True)
+    n_rows = profile["__rows"]
+    print(f"Successfully scanned CSV with {n_rows} rows and {len(schema)} columns")
+    emit_progress("loaded", 25, rows=n_rows)
+
+    if not name_column:
+        print("No specific name column found. Looking for string columns...")
+        # Columns with all-unique values are not good for product names
+        string_columns = [col for col in name_candidates if profile[f"__unique_{col}"] != n_rows]
+        if string_columns:
+            name_column = string_columns[0]
+            print(f"Using string column '{name_column}' for product names")
+
+    if not name_column:
+        print("No suitable name column found. Creating dummy product names.")
+        lf = lf.with_columns(pl.format("Product {}", pl.int_range(1, pl.len() + 1)).alias("ProductName"))
+        name_column = 'ProductName'
+
+    # Ensure required columns exist
+    missing_columns = [col for col in ["MarketShare", "MarketGrowth"] if col not in schema]
+    if missing_columns:
+        print(f"Missing required columns: {missing_columns}")
+        numeric_columns = [col for col, dtype in lf.collect_schema().items() if dtype.is_numeric()]
+
+        if len(numeric_columns) >= 2:
+            print(f"Found {len(numeric_columns)} numeric columns: {numeric_columns}")
+            for i, col in enumerate(missing_columns[:2]):
+                print(f"Using '{numeric_columns[i]}' as {col}")
+                lf = lf.with_columns(pl.col(numeric_columns[i]).alias(col))
+        else:
+            print("Error: Not enough numeric columns for analysis")
+            print("Creating synthetic data for analysis")
+            if "MarketShare" not in schema:
+                lf = lf.with_columns(pl.lit(pl.Series(np.random.uniform(0, 10, size=n_rows))).alias("MarketShare"))
+                print("Created synthetic MarketShare column")
+            if "MarketGrowth" not in schema:
+                lf = lf.with_columns(pl.lit(pl.Series(np.random.uniform(-5, 15, size=n_rows))).alias("MarketGrowth"))
+                print("Created synthetic MarketGrowth column")
+
+    # Look for Quantity column if not already found
+    if "Quantity" not in schema:
+        print("No explicit Quantity column found. Looking for suitable numeric columns...")
+        if quantity_candidates:
+            print(f"Found {len(quantity_candidates)} potential quantity columns: {quantity_candidates}")
+            for col in quantity_candidates:
+                check = profile[f"__quantity_{col}"]
+                if check["non_empty"] and check["non_negative"] and check["mean"] is not None and check["mean"] > 1:
+                    lf = lf.with_columns(pl.col(col).alias("Quantity"))
+                    print(f"Selected '{col}' as Quantity column")
+                    break
+            else:
+                lf = lf.with_columns(pl.col(quantity_candidates[0]).alias("Quantity"))
+                print(f"Using '{quantity_candidates[0]}' as Quantity column (fallback)")
+        else:
+            print("No numeric columns available for quantity. Using default value of 1.")
+            lf = lf.with_columns(pl.lit(1).alias("Quantity"))
+
+    print("\nUsing the following columns for analysis:")
+    print(f"  Product Name: {name_column}")
+    for col in VALUE_COLUMNS:
+        print(f"  {col}: {col}")
+
+    # Customer feedback columns (Rating and Review in sample.csv)
+    schema = lf.collect_schema()
+    review_column, rating_column = (
+        find_review_columns(schema.names(), name_column, segment_by) if analyse_reviews and n_rows else (None, None)
+    )
+
+    # Number format of text value columns
+    samples = {col: pd.Series(profile[f"__sample_{col}"], dtype=object) for col in text_columns}
+    decimal_comma = {col: detect_decimal_comma(sample) for col, sample in samples.items()}
+    percent = {col: detect_percent(sample) for col, sample in samples.items()}
+
+    # Clean numeric data and keep only what the analysis reads (projection pushdown)
+    analysis_columns = list(dict.fromkeys([name_column] + VALUE_COLUMNS + ([segment_by] if segment_by else [])))
+    feedback_columns = []
+    if review_column:
+        feedback_columns.append(pl.col(review_column).cast(pl.String))
+    if rating_column:
+        feedback_columns.append(to_numeric(rating_column, schema[rating_column], fill=None))
+    # Per text column: non-empty values and values the plain cast reads, compared with the parsed count
+    read_columns = [
+        expr
+        for col in text_columns
+        for expr in (
+            pl.col(col).is_not_null().alias(f"__{col}_values"),
+            to_numeric(col, schema[col], fill=None).is_not_null().alias(f"__{col}_plain"),
+        )
+    ]
+    lf = lf.select([
+        to_numeric(
+            col, schema[col], fill=None, decimal_comma=decimal_comma.get(col, False), percent=percent.get(col, False)
+        )
+        if col in VALUE_COLUMNS else pl.col(col)
+        for col in analysis_columns
+    ] + feedback_columns + read_columns)
+    read_counts = {}
+    if text_columns:
+        # Materialize once: the regex clean-up is too costly to repeat in every query below
+        cleaned = lf.collect()
+        read_counts = cleaned.select(
+            [pl.col(col).count().alias(f"__{col}_parsed") for col in text_columns]
+            + [pl.col(expr.meta.output_name()).sum() for expr in read_columns]
+        ).row(0, named=True)
+        lf = cleaned.drop([expr.meta.output_name() for expr in read_columns]).lazy()
+    lf = lf.with_columns([pl.col(col).fill_null(0) for col in VALUE_COLUMNS])
+
+    # Make sure we have at least some data
+    if n_rows == 0:
+        print("Warning: DataFrame is empty. Creating sample data for demonstration.")
+        lf = pl.LazyFrame({
+            name_column: ["Sample Product 1", "Sample Product 2", "Sample Product 3", "Sample Product 4"],
+            "MarketShare": [8, 12, 3, 5],
+            "MarketGrowth": [15, 5, 20, -2],
+            "Quantity": [100, 200, 50, 80],
+        }).select(
+            [pl.col(col) if col in [name_column] + VALUE_COLUMNS else pl.lit(None, dtype=pl.String).alias(col)
+             for col in analysis_columns]
+        )
+    elif n_rows < 4:
+        print(f"Warning: Only {n_rows} data points. Adding sample data points.")
+        sample_data = pl.DataFrame({
+            name_column: ["Sample Product 1", "Sample Product 2", "Sample Product 3"],
+            "MarketShare": [8, 12, 3],
+            "MarketGrowth": [15, 5, 20],
+            "Quantity": [100, 200, 50],
+        })
+        lf = pl.concat([lf.collect(), sample_data], how="diagonal_relaxed").lazy()
+
+    # Step 1 and 2: thresholds and classification in the same query
+    classified = (
+        lf.with_row_index("__row")
+        .with_columns(classify_bcg(median("MarketShare"), median("MarketGrowth")))
+    )
+    stats_query = lf.select(
+        [
+            expr
+            for col in VALUE_COLUMNS
+            for expr in (
+                pl.col(col).min().alias(f"{col}_min"),
+                pl.col(col).max().alias(f"{col}_max"),
+                pl.col(col).mean().alias(f"{col}_mean"),
+                median(col).alias(f"{col}_median"),
+            )
+        ] + [pl.len().alias("rows")]
+    )
+    counts_query = classified.group_by("BCG Category").agg(pl.len().alias("count"))
+    top_query = classified.sort("Quantity", descending=True, maintain_order=True).head(10)
+
+    # One collect_all so the shared scan and classification are computed once
+    stats, counts, top, classified = pl.collect_all([stats_query, counts_query, top_query, classified])
+    stats = stats.row(0, named=True)
+    total = stats["rows"]
+
+    coerced_counts = {col: 0 for col in VALUE_COLUMNS}
+    for col in text_columns:
+        parsed = read_counts[f"__{col}_parsed"]
+        # In a decimal-comma or percent column every value went through the tolerant parse
+        plain = 0 if decimal_comma[col] or percent[col] else read_counts[f"__{col}_plain"]
+        coerced_counts[col] = parsed - plain
+        report_coerced(
+            col, coerced_counts[col], read_counts[f"__{col}_values"] - parsed, decimal_comma[col], percent[col]
+        )
+
+    print("\nData Summary:")
+    for col in VALUE_COLUMNS:
+        values = [stats[f"{col}_{stat}"] for stat in ("min", "max", "mean", "median")]
+        min_val, max_val, mean_val, median_val = [float(v) if v is not None else 0 for v in values]
+        print(f"  {col}: Min={min_val:.2f}, Max={max_val:.2f}, Mean={mean_val:.2f}, Median={median_val:.2f}")
+
+    share_thresh = float(stats["MarketShare_median"]) if stats["MarketShare_median"] is not None else 5.0
+    growth_thresh = float(stats["MarketGrowth_median"]) if stats["MarketGrowth_median"] is not None else 5.0
+    print(f"\nCalculated Thresholds:")
+    print(f"  Market Share Threshold: {share_thresh:.2f}")
+    print(f"  Market Growth Threshold: {growth_thresh:.2f}")
+
+    category_counts = dict(zip(counts["BCG Category"].to_list(), counts["count"].to_list()))
+
+    output_columns = analysis_columns + ["BCG Category"]
+    if total < 10:
+        print(f"Warning: Only {total} products available for top products list")
+        top = classified
+    top_products = to_pandas(top, output_columns, index=top["__row"].to_list())
+    df = to_pandas(classified, output_columns)
+    segments = None
+
+    def details(reviews=True):
+        """Segment tables (computed once and kept) and, if asked, the review feature tables.
+
+        Runs on the classified frame already in memory, with the segment and
+        review queries in a single collect_all. Adds the "Segment" and
+        "Segment Category" columns to df like segment_pandas() does.
+        """
+        nonlocal classified, segments
+        queries = []
+        segmented = segment_by and segments is None
+        if segmented:
+            # Per-segment thresholds and classification as window expressions
+            classified = classified.with_columns(
+                pl.col(segment_by).cast(pl.String).fill_null(MISSING_SEGMENT).alias("Segment")
+            ).with_columns(
+                classify_bcg(
+                    median("MarketShare").over("Segment"), median("MarketGrowth").over("Segment"), "Segment Category"
+                )
+            )
+            df["Segment"] = classified["Segment"].to_numpy()
+            df["Segment Category"] = classified["Segment Category"].to_numpy()
+            queries.append(
+                classified.lazy().group_by("Segment").agg(
+                    [
+                        pl.len().alias("rows"),
+                        median("MarketShare").alias("share_thresh"),
+                        median("MarketGrowth").alias("growth_thresh"),
+                    ] + [(pl.col("Segment Category") == category).sum().alias(category) for category in BCG_CATEGORIES]
+                ).sort("Segment")
+            )
+            queries.append(
+                classified.lazy().sort("Quantity", descending=True, maintain_order=True)
+                .group_by("Segment", maintain_order=True)
+                .head(10)
+            )
+
+        review_keys = [name_column, "BCG Category"] + ([("Segment", name_column)] if segment_by else [])
+        review_query_pairs = []
+        if reviews and (review_column or rating_column):
+            review_query_pairs = review_queries(classified.lazy(), review_keys, review_column, rating_column)
+            queries += [query for pair in review_query_pairs for query in pair if query is not None]
+
+        frames = iter(pl.collect_all(queries))
+        if segmented:
+            segment_stats, segment_top = next(frames), next(frames)
+            segments = (
+                to_pandas(segment_stats, segment_stats.columns[1:], index=segment_stats["Segment"].to_list()),
+                to_pandas(
+                    segment_top, output_columns + ["Segment", "Segment Category"],
+                    index=segment_top["__row"].to_list()
+                ),
+            )
+
+        review_tables = None
+        if review_query_pairs:
+            review_tables = {}
+            for key, (_, terms_query) in zip(review_keys, review_query_pairs):
+                key_stats = next(frames)
+                key_terms = next(frames) if terms_query is not None else None
+                n_columns = len(key_columns(key))
+                review_tables[key] = (
+                    to_pandas(key_stats, key_stats.columns[n_columns:], index=key_values(key_stats, key)),
+                    to_pandas(key_terms, key_terms.columns[n_columns:]).assign(key=key_values(key_terms, key))
+                    if key_terms is not None else None,
+                )
+        return segments, review_tables
+
+    return df, name_column, share_thresh, growth_thresh, category_counts, top_products, coerced_counts, details
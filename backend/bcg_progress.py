@@ -0,0 +1,18 @@
+"""
+Structured progress events for ball.py.
+
+Each event is one stdout line: PROGRESS_PREFIX followed by a JSON object with
+the stage name, rows processed so far (None when not known yet) and an overall
+percentage. process_bcg.js parses these lines; everything else on stdout is
+plain log output.
+"""
+import json
+
+PROGRESS_PREFIX = "BCG_PROGRESS "
+
+
+def emit_progress(stage, percent, rows=None, **fields):
+    """Print one progress event and flush so the reader sees it immediately."""
+    event = {"stage": stage, "rows": rows, "percent": percent}
+    event.update(fields)
+    print(PROGRESS_PREFIX + json.dumps(event), flush=True)
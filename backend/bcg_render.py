@@ -0,0 +1,245 @@
+"""
+Rendering for ball.py: the BCG matrix image and the per-segment small multiples.
+
+ball.py writes _summary.json first and renders in a separate worker process
+(start_render_worker) so a slow 300-dpi savefig never holds back the numbers.
+The worker is this module run as a script on a pickled payload:
+
+    python bcg_render.py payload.pkl output.png
+"""
+import os
+import pickle
+import subprocess
+import sys
+import traceback
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+from bcg_columns import BCG_CATEGORIES
+
+BCG_PALETTE = {
+    "Star": "#FFD700",      # Gold
+    "Cash Cow": "#32CD32",  # Lime Green
+    "Question Mark": "#1E90FF", # Dodger Blue
+    "Dog": "#FF6347"        # Tomato
+}
+
+# Small multiples beyond this many segments only cover the largest ones
+MAX_SEGMENT_PANELS = 24
+
+
+def plot_bcg_matrix(df, name_column, share_thresh, growth_thresh, output_file_path):
+    plt.figure(figsize=(12, 8))
+    plt.style.use('seaborn-v0_8-whitegrid')
+
+    # Create scatter plot
+    scatter = sns.scatterplot(
+        data=df,
+        x="MarketShare", 
+        y="MarketGrowth",
+        hue="BCG Category", 
+        style="BCG Category", 
+        s=150,
+        alpha=0.8,
+        palette=BCG_PALETTE
+    )
+
+    # Add product names as labels with limit to prevent overcrowding
+    max_labels = min(15, len(df))
+    for idx, row in df.head(max_labels).iterrows():
+        try:
+            label = str(row[name_column]) if not pd.isna(row[name_column]) else f"Product {idx}"
+            label = label[:15] + '...' if len(label) > 15 else label
+            plt.annotate(
+                label,
+                xy=(row['MarketShare'], row['MarketGrowth']),
+                xytext=(5, 5),
+                textcoords='offset points',
+                fontsize=8
+            )
+        except Exception as e:
+            print(f"Error annotating label for row {idx}: {e}")
+
+    # Get axis limits with error handling
+    try:
+        x_min = float(df['MarketShare'].min()) if not pd.isna(df['MarketShare'].min()) else 0
+        x_max = float(df['MarketShare'].max()) if not pd.isna(df['MarketShare'].max()) else 10
+        y_min = float(df['MarketGrowth'].min()) if not pd.isna(df['MarketGrowth'].min()) else 0
+        y_max = float(df['MarketGrowth'].max()) if not pd.isna(df['MarketGrowth'].max()) else 10
+        
+        # Ensure we have valid ranges
+        if x_min >= x_max:
+            x_min = 0
+            x_max = 10
+        if y_min >= y_max:
+            y_min = 0
+            y_max = 10
+            
+        # Add some padding
+        x_range = x_max - x_min
+        y_range = y_max - y_min
+        x_min -= x_range * 0.1
+        x_max += x_range * 0.1
+        y_min -= y_range * 0.1
+        y_max += y_range * 0.1
+        
+        plt.xlim(x_min, x_max)
+        plt.ylim(y_min, y_max)
+    except Exception as e:
+        print(f"Error setting axis limits: {e}")
+        # Use default limits
+        plt.xlim(0, 10)
+        plt.ylim(0, 10)
+
+    # Add quadrant lines
+    plt.axvline(x=share_thresh, color='grey', linestyle='--', alpha=0.6)
+    plt.axhline(y=growth_thresh, color='grey', linestyle='--', alpha=0.6)
+
+    # Add quadrant labels with safe positioning
+    try:
+        plt.text(x_max*0.75, y_max*0.9, 'STARS', fontsize=14, fontweight='bold', color='#FFD700')
+        plt.text(x_max*0.75, y_min*0.9, 'CASH COWS', fontsize=14, fontweight='bold', color='#32CD32')
+        plt.text(x_min*1.1, y_max*0.9, 'QUESTION MARKS', fontsize=14, fontweight='bold', color='#1E90FF')
+        plt.text(x_min*1.1, y_min*0.9, 'DOGS', fontsize=14, fontweight='bold', color='#FF6347')
+    except Exception as e:
+        print(f"Error adding quadrant labels: {e}")
+
+    # Styling
+    plt.title("BCG Matrix Analysis", fontsize=16, fontweight='bold')
+    plt.xlabel(f"Market Share (Threshold: {share_thresh:.2f})", fontsize=12)
+    plt.ylabel(f"Market Growth Rate (Threshold: {growth_thresh:.2f})", fontsize=12)
+    plt.legend(title="Categories", fontsize=10, title_fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    save_figure(output_file_path)
+
+
+def plot_segment_grid(df, segment_stats, segment_by, output_file_path):
+    """Render one small BCG matrix per segment in a single figure with shared axes."""
+    panels = segment_stats.sort_values("rows", ascending=False, kind="stable").head(MAX_SEGMENT_PANELS)
+    if len(panels) < len(segment_stats):
+        print(f"Rendering the {len(panels)} largest of {len(segment_stats)} segments")
+
+    n_cols = min(4, len(panels))
+    n_rows = -(-len(panels) // n_cols)
+    plt.style.use('seaborn-v0_8-whitegrid')
+    fig, axes = plt.subplots(
+        n_rows, n_cols, figsize=(4 * n_cols, 3.5 * n_rows), sharex=True, sharey=True, squeeze=False
+    )
+
+    # Row positions of every segment from a single grouping pass
+    rows_by_segment = df.groupby("Segment", sort=False).indices
+    colors = df["Segment Category"].map(BCG_PALETTE).to_numpy()
+    share = df["MarketShare"].to_numpy()
+    growth = df["MarketGrowth"].to_numpy()
+
+    for ax, (segment, stats) in zip(axes.flat, panels.iterrows()):
+        rows = rows_by_segment[segment]
+        ax.scatter(share[rows], growth[rows], c=colors[rows], s=20, alpha=0.8)
+        ax.axvline(x=stats["share_thresh"], color='grey', linestyle='--', alpha=0.6)
+        ax.axhline(y=stats["growth_thresh"], color='grey', linestyle='--', alpha=0.6)
+        ax.set_title(f"{segment} (n={int(stats['rows'])})", fontsize=11, fontweight='bold')
+        ax.grid(True, alpha=0.3)
+    for ax in axes.flat[len(panels):]:
+        ax.axis('off')
+
+    handles = [
+        plt.Line2D([], [], marker='o', linestyle='', color=BCG_PALETTE[category], label=category)
+        for category in BCG_CATEGORIES
+    ]
+    fig.legend(
+        handles=handles, title="Categories", loc="upper center", bbox_to_anchor=(0.5, 0),
+        ncol=len(handles), fontsize=10, title_fontsize=12
+    )
+    fig.suptitle(f"BCG Matrix Analysis by {segment_by}", fontsize=16, fontweight='bold')
+    fig.supxlabel("Market Share (dashed: segment threshold)", fontsize=12)
+    fig.supylabel("Market Growth Rate (dashed: segment threshold)", fontsize=12)
+    fig.tight_layout(rect=(0, 0, 1, 0.97))
+    save_figure(output_file_path)
+
+
+def save_figure(output_file_path):
+    output_dir = os.path.dirname(output_file_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        
+    plt.savefig(output_file_path, dpi=300, bbox_inches='tight')
+    print(f"\nBCG Matrix visualization saved to: {output_file_path}")
+
+
+def plot_error_image(output_file_path, message):
+    """Placeholder image so callers always find a PNG next to the summary."""
+    plt.figure(figsize=(12, 8))
+    plt.text(0.5, 0.5, message, horizontalalignment='center', fontsize=20)
+    plt.axis('off')
+    plt.savefig(output_file_path, dpi=300, bbox_inches='tight')
+
+
+def render(payload, output_file_path):
+    """Draw the image described by a payload from build_render_payload()."""
+    if payload["segment_stats"] is not None:
+        plot_segment_grid(payload["df"], payload["segment_stats"], payload["segment_by"], output_file_path)
+    else:
+        plot_bcg_matrix(
+            payload["df"], payload["name_column"], payload["share_thresh"], payload["growth_thresh"], output_file_path
+        )
+
+
+def build_render_payload(df, name_column, share_thresh, growth_thresh, segment_by=None, segment_stats=None):
+    """Only the columns the chosen plot reads; segment_stats selects the small-multiples grid."""
+    columns = [name_column, "MarketShare", "MarketGrowth", "BCG Category"]
+    if segment_stats is not None:
+        columns += ["Segment", "Segment Category"]
+    return {
+        "df": df[list(dict.fromkeys(columns))],
+        "name_column": name_column,
+        "share_thresh": share_thresh,
+        "growth_thresh": growth_thresh,
+        "segment_by": segment_by,
+        "segment_stats": segment_stats,
+    }
+
+
+def render_payload_path(output_file_path):
+    return output_file_path.replace('.png', '_render.pkl')
+
+
+def start_render_worker(payload, output_file_path):
+    """Render in a separate Python process; returns the Popen to wait() on.
+
+    The pickled payload belongs to the caller: remove it with
+    remove_render_payload() once the worker is done or stopped.
+    """
+    payload_path = render_payload_path(output_file_path)
+    with open(payload_path, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    try:
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), payload_path, output_file_path])
+    except Exception:
+        remove_render_payload(output_file_path)
+        raise
+
+
+def remove_render_payload(output_file_path):
+    try:
+        os.remove(render_payload_path(output_file_path))
+    except FileNotFoundError:
+        pass
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(line_buffering=True)
+    payload_path, output_file_path = sys.argv[1:3]
+    with open(payload_path, 'rb') as f:
+        payload = pickle.load(f)
+
+    try:
+        render(payload, output_file_path)
+    except Exception as e:
+        print(f"Error creating BCG Matrix plot: {e}")
+        print(traceback.format_exc())
+        sys.exit(1)
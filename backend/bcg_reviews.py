@@ -0,0 +1,178 @@
+"""
+Rating and review-text features for ball.py.
+
+Computed in the same run as the BCG classification, on whole columns at once
+(tokenize -> explode -> lexicon lookup -> groupby), so the summary can carry
+per-product and per-quadrant customer feedback without a per-row Python loop
+or a round trip to an LLM.
+
+Both engines build the same two tables for a key (the product name or BCG
+category column, or a tuple of columns such as ("Segment", product name)) and
+format them with review_summaries():
+- stats: one row per key value with reviews, rating_count/sum/min/max,
+  sentiment and issue_<name> counts; tuple keys give tuple index values
+- terms: key, polarity ("praise"/"complaint"), term, count; the TOP_TERMS most
+  frequent terms per key value and polarity, most frequent first
+"""
+import numpy as np
+import pandas as pd
+
+from bcg_columns import RATING_PATTERNS, REVIEW_PATTERNS, find_column_by_pattern
+
+# Words are lowercase letters with an optional apostrophe part ("didn't")
+TOKEN_PATTERN = r"[a-z]+(?:'[a-z]+)?"
+
+# Word weights for the review sentiment score; a review scores the clipped sum in [-1, 1]
+SENTIMENT_LEXICON = {
+    # praise
+    "amazing": 1.0, "best": 1.0, "excellent": 1.0, "great": 1.0, "happy": 1.0, "love": 1.0,
+    "loved": 1.0, "perfect": 1.0, "recommend": 1.0, "satisfied": 1.0,
+    "fair": 0.5, "fast": 0.5, "good": 0.5, "like": 0.5, "nice": 0.5, "reasonable": 0.5,
+    "useful": 0.5, "worth": 0.5,
+    # complaints
+    "bad": -1.0, "broken": -1.0, "damaged": -1.0, "defective": -1.0, "disappointed": -1.0,
+    "poor": -1.0, "terrible": -1.0, "useless": -1.0, "worst": -1.0, "wrong": -1.0,
+    "below": -0.5, "delayed": -0.5, "expensive": -0.5, "late": -0.5, "missing": -0.5,
+    "slow": -0.5, "improve": -0.25,
+}
+
+# A lexicon word right after one of these flips sign ("not good" is a complaint)
+NEGATORS = [
+    "not", "no", "never", "nothing", "hardly", "didn't", "don't", "doesn't", "isn't", "wasn't",
+    "didnt", "dont", "doesnt", "isnt", "wasnt",
+]
+
+# Operational issues reported as the share of reviews mentioning them (not negated)
+ISSUE_TERMS = {
+    "damaged": ["damaged", "broken", "defective", "cracked", "torn", "leaking", "leaked"],
+    "late": ["late", "slow", "delay", "delayed"],
+    "wrong_item": ["wrong", "incorrect"],
+    "missing": ["missing"],
+}
+
+TOP_TERMS = 3
+
+
+def find_review_columns(columns, name_column, segment_by=None):
+    """Pick the review text and rating columns (either may be None)."""
+    review_column = find_column_by_pattern(columns, REVIEW_PATTERNS, exclude=(name_column, segment_by))
+    rating_column = find_column_by_pattern(columns, RATING_PATTERNS, exclude=(name_column, segment_by, review_column))
+    if review_column or rating_column:
+        print(f"Customer feedback columns: reviews='{review_column}', ratings='{rating_column}'")
+    return review_column, rating_column
+
+
+def key_columns(key):
+    """Columns of a review table key: one column name or a tuple of them."""
+    return list(key) if isinstance(key, tuple) else [key]
+
+
+def review_tables_pandas(df, keys, review_column=None, rating_column=None):
+    """Build the (stats, terms) tables for each key in `keys` from one tokenization."""
+    rows = pd.DataFrame(index=df.index)
+    tokens = None
+
+    if rating_column:
+        rows["rating"] = pd.to_numeric(df[rating_column], errors='coerce')
+
+    if review_column:
+        has_review = df[review_column].notna()
+        rows["reviewed"] = has_review
+
+        # One token per row: index label of the review, token text
+        exploded = (
+            df.loc[has_review, review_column].astype(str).str.lower()
+            .str.replace("’", "'", regex=False)
+            .str.findall(TOKEN_PATTERN)
+            .explode()
+            .dropna()
+        )
+        row_ids = exploded.index.to_numpy()
+        words = exploded.to_numpy(dtype=object)
+        previous = pd.Series(np.r_[[None], words[:-1]] if len(words) else words)
+        same_review = np.r_[[False], row_ids[1:] == row_ids[:-1]] if len(words) else np.zeros(0, dtype=bool)
+        negated = same_review & previous.isin(NEGATORS).to_numpy()
+        weight = pd.Series(words).map(SENTIMENT_LEXICON).to_numpy(dtype='float64')
+        tokens = pd.DataFrame({
+            "row": row_ids,
+            "token": words,
+            "negated": negated,
+            "weight": np.where(negated, -weight, weight),
+        })
+
+        score = tokens.groupby("row")["weight"].sum().reindex(df.index, fill_value=0.0).clip(-1, 1)
+        rows["sentiment"] = score.where(has_review)
+        for issue, terms in ISSUE_TERMS.items():
+            hit = tokens["token"].isin(terms) & ~tokens["negated"]
+            rows[f"issue_{issue}"] = hit.groupby(tokens["row"]).any().reindex(df.index, fill_value=False)
+
+        tokens = tokens[tokens["weight"].notna() & (tokens["weight"] != 0)]
+        tokens = tokens.assign(
+            polarity=np.where(tokens["weight"] > 0, "praise", "complaint"),
+            term=np.where(tokens["negated"], "not " + tokens["token"], tokens["token"]),
+        )
+
+    tables = {}
+    for key in keys:
+        grouped = rows.groupby([df[col] for col in key_columns(key)] if isinstance(key, tuple) else df[key])
+        stats = pd.DataFrame(index=grouped.size().index)
+        if rating_column:
+            stats["rating_count"] = grouped["rating"].count()
+            stats["rating_sum"] = grouped["rating"].sum()
+            stats["rating_min"] = grouped["rating"].min()
+            stats["rating_max"] = grouped["rating"].max()
+
+        terms = None
+        if review_column:
+            stats["reviews"] = grouped["reviewed"].sum()
+            stats["sentiment"] = grouped["sentiment"].mean()
+            for issue in ISSUE_TERMS:
+                stats[f"issue_{issue}"] = grouped[f"issue_{issue}"].sum()
+
+            key_values = [df[col].loc[tokens["row"]].to_numpy() for col in key_columns(key)]
+            terms = (
+                tokens.assign(key=list(zip(*key_values)) if isinstance(key, tuple) else key_values[0])
+                .groupby(["key", "polarity", "term"]).size().rename("count").reset_index()
+                .sort_values(["count", "term"], ascending=[False, True], kind="stable")
+                .groupby(["key", "polarity"], sort=False).head(TOP_TERMS)
+            )
+        tables[key] = (stats, terms)
+    return tables
+
+
+def review_summaries(stats, terms, keys):
+    """Format the feature tables into JSON-ready dicts for the requested keys only."""
+    keys = [key for key in dict.fromkeys(keys) if key in stats.index]
+    if not keys:
+        return {}
+
+    terms_by_key = {}
+    if terms is not None:
+        wanted = terms[terms["key"].isin(keys)]
+        for key, polarity, term in zip(wanted["key"], wanted["polarity"], wanted["term"]):
+            terms_by_key.setdefault((key, polarity), []).append(term)
+
+    summaries = {}
+    for key, row in stats.loc[keys].iterrows():
+        features = {}
+        if "rating_count" in row:
+            # The mean comes from a rounded sum so engines that add in a different order agree
+            count = int(row["rating_count"])
+            features["rating"] = {
+                "count": count,
+                "mean": round(round(float(row["rating_sum"]), 9) / count, 2) if count else None,
+                "min": round(float(row["rating_min"]), 2) if count else None,
+                "max": round(float(row["rating_max"]), 2) if count else None,
+            }
+        if "reviews" in row:
+            reviews = int(row["reviews"])
+            features["reviews"] = reviews
+            features["sentiment"] = round(float(row["sentiment"]), 3) if reviews else None
+            features["top_praise"] = terms_by_key.get((key, "praise"), [])
+            features["top_complaints"] = terms_by_key.get((key, "complaint"), [])
+            features["issue_share"] = {
+                issue: round(int(row[f"issue_{issue}"]) / reviews, 3) if reviews else 0.0
+                for issue in ISSUE_TERMS
+            }
+        summaries[key] = features
+    return summaries
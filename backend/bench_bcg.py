@@ -0,0 +1,100 @@
+"""
+Benchmark the pandas and polars engines of ball.py.
+
+Builds a large CSV by tiling an input file (sample.csv by default) with a
+little noise on the market columns, runs ball.py once per engine and repeat,
+and checks that both engines wrote byte-identical _summary.json files.
+
+Usage: python bench_bcg.py [--rows 200000] [--repeat 3] [--input ../sample.csv]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BALL_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ball.py")
+ENGINES = ["pandas", "polars"]
+
+
+def build_input(source_csv, rows, target_csv, seed=0):
+    """Tile source_csv up to `rows` rows, jittering float columns so medians and ties stay realistic."""
+    df = pd.read_csv(source_csv)
+    repeats = -(-rows // len(df))
+    big = pd.concat([df] * repeats, ignore_index=True).head(rows)
+
+    rng = np.random.default_rng(seed)
+    for col in big.select_dtypes(include=["float"]).columns:
+        big[col] = big[col] * rng.uniform(0.9, 1.1, size=len(big))
+    big.to_csv(target_csv, index=False)
+    return os.path.getsize(target_csv)
+
+
+def run_engine(engine, csv_path, output_path):
+    """Run ball.py once; returns (wall seconds, analysis seconds reported by ball.py)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, BALL_PY, csv_path, output_path, "--engine", engine],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stdout[-2000:])
+        raise RuntimeError(f"ball.py failed with --engine {engine}")
+    if "Falling back to pandas engine" in result.stdout:
+        print(f"WARNING: {engine} run fell back to the pandas engine")
+    analysis = re.search(r"Analysis time \(\w+ engine\): ([0-9.]+)s", result.stdout)
+    return elapsed, float(analysis.group(1)) if analysis else float("nan")
+
+
+def main():
+    default_input = os.path.join(os.path.dirname(BALL_PY), "..", "sample.csv")
+    parser = argparse.ArgumentParser(description="Compare ball.py engines")
+    parser.add_argument("--input", default=default_input, help="CSV to tile (default: sample.csv)")
+    parser.add_argument("--rows", type=int, default=200000, help="Rows in the generated CSV")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per engine")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "bench.csv")
+        size = build_input(args.input, args.rows, csv_path)
+        print(f"Generated {args.rows} rows ({size / 1e6:.1f} MB) from {args.input}")
+
+        timings = {engine: [] for engine in ENGINES}
+        analysis_timings = {engine: [] for engine in ENGINES}
+        summaries = {}
+        for run in range(args.repeat):
+            for engine in ENGINES:
+                output_path = os.path.join(workdir, f"{engine}.png")
+                wall, analysis = run_engine(engine, csv_path, output_path)
+                timings[engine].append(wall)
+                analysis_timings[engine].append(analysis)
+                with open(output_path.replace('.png', '_summary.json'), 'rb') as f:
+                    summaries[engine] = f.read()
+
+        print(f"\n{'engine':<8} {'analysis best (s)':>18} {'end-to-end best (s)':>20} {'end-to-end median (s)':>22}")
+        for engine in ENGINES:
+            print(
+                f"{engine:<8} {min(analysis_timings[engine]):>18.3f} {min(timings[engine]):>20.2f} "
+                f"{statistics.median(timings[engine]):>22.2f}"
+            )
+
+        analysis_speedup = min(analysis_timings["pandas"]) / min(analysis_timings["polars"])
+        speedup = min(timings["pandas"]) / min(timings["polars"])
+        print(f"\npolars speedup (best of {args.repeat}): analysis {analysis_speedup:.2f}x, end-to-end {speedup:.2f}x")
+
+        identical = summaries["pandas"] == summaries["polars"]
+        print(f"Summaries byte-identical: {'yes' if identical else 'NO'}")
+        return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
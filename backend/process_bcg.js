@@ -2,13 +2,25 @@ const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs');
 
+// Must match PROGRESS_PREFIX in bcg_progress.py
+const PROGRESS_PREFIX = 'BCG_PROGRESS ';
+
 /**
  * Process a CSV file using the Python ball.py script
  * @param {string} csvFilePath - Path to the CSV file
  * @param {string} outputDir - Directory where output files will be saved
- * @returns {Promise<{imagePath: string, summaryData: object}>}
+ * @param {object} [options]
+ * @param {string} [options.engine] - 'pandas' or 'polars' (defaults to BCG_ENGINE env var, then pandas)
+ * @param {string} [options.segmentBy] - Column (e.g. 'Country') to build one matrix per value of
+ * @param {string} [options.segmentRender] - 'grid' (small multiples image) or 'none' (segment summaries only)
+ * @param {function} [options.onProgress] - Called with each progress event ({stage, rows, percent, ...})
+ * @param {function} [options.onSummary] - Called with the summary as soon as it is written
+ *   (first with partial: true right after classification, then the complete one)
+ * @param {number} [options.idleTimeoutMs] - Kill the run after this long without a progress event (default 60 s)
+ * @returns {Promise<{imagePath: string, imageBase64: string|null, summaryData: object}>}
+ *   imageBase64 is null if the run was stopped after the summary was written but before the image was ready
  */
-async function processBCGMatrix(csvFilePath, outputDir = './temp/output') {
+async function processBCGMatrix(csvFilePath, outputDir = './temp/output', options = {}) {
   return new Promise((resolve, reject) => {
     // Ensure output directory exists
     if (!fs.existsSync(outputDir)) {
@@ -43,28 +55,75 @@ async function processBCGMatrix(csvFilePath, outputDir = './temp/output') {
     }
     
     // Run Python script with timeout
-    const pythonProcess = spawn('python', [
+    const pythonArgs = [
       path.join(__dirname, 'ball.py'),
       csvFilePath,
       outputFilePath
-    ]);
+    ];
+    if (options.engine) {
+      pythonArgs.push('--engine', options.engine);
+    }
+    if (options.segmentBy) {
+      pythonArgs.push('--segment-by', options.segmentBy);
+      if (options.segmentRender) {
+        pythonArgs.push('--segment-render', options.segmentRender);
+      }
+    }
+    const pythonProcess = spawn('python', pythonArgs);
     
     let pythonOutput = '';
     let pythonErrors = '';
+    let pendingLine = '';
+    let latestSummary = null;
+    let timedOut = false;
     
-    // Set a timeout to kill the process if it takes too long
-    const timeoutMs = 60000; // 60 seconds
-    const timeout = setTimeout(() => {
-      console.error(`Python process timed out after ${timeoutMs/1000} seconds`);
-      pythonProcess.kill();
-      reject(new Error('Analysis timed out. The file may be too large or complex to process.'));
-    }, timeoutMs);
+    // Kill the process only if it stops reporting progress, not after a fixed total time
+    const idleTimeoutMs = options.idleTimeoutMs || 60000; // 60 seconds
+    let timeout = null;
+    const resetTimeout = () => {
+      clearTimeout(timeout);
+      timeout = setTimeout(() => {
+        console.error(`Python process reported no progress for ${idleTimeoutMs/1000} seconds`);
+        timedOut = true;
+        pythonProcess.kill();
+      }, idleTimeoutMs);
+    };
+    resetTimeout();
+    
+    // Progress events are single stdout lines: BCG_PROGRESS {"stage": ..., "rows": ..., "percent": ...}
+    const handleLine = (line) => {
+      if (!line.startsWith(PROGRESS_PREFIX)) return;
+      let event;
+      try {
+        event = JSON.parse(line.slice(PROGRESS_PREFIX.length));
+      } catch (parseError) {
+        console.error(`Could not parse progress event: ${line}`);
+        return;
+      }
+      resetTimeout();
+      console.log(`BCG progress: ${event.stage} ${event.percent}%${event.rows != null ? ` (${event.rows} rows)` : ''}`);
+      if (options.onProgress) options.onProgress(event);
+      
+      // The summary file is written atomically, so it can be read as soon as it is announced
+      if (event.stage === 'summary') {
+        try {
+          latestSummary = JSON.parse(fs.readFileSync(event.path, 'utf8'));
+          if (options.onSummary) options.onSummary(latestSummary);
+        } catch (error) {
+          console.error(`Error reading summary file: ${error.message}`);
+        }
+      }
+    };
     
     // Collect data from stdout
     pythonProcess.stdout.on('data', (data) => {
       const dataStr = data.toString();
       pythonOutput += dataStr;
       console.log(`Python output: ${dataStr}`);
+      
+      const lines = (pendingLine + dataStr).split(/\r?\n/);
+      pendingLine = lines.pop();
+      lines.forEach(handleLine);
     });
     
     // Collect errors from stderr
@@ -77,6 +136,20 @@ async function processBCGMatrix(csvFilePath, outputDir = './temp/output') {
     // Handle process completion
     pythonProcess.on('close', (code) => {
       clearTimeout(timeout);
+      if (pendingLine) handleLine(pendingLine);
+      
+      if (timedOut) {
+        // Return the numbers that were already computed rather than discarding them
+        if (latestSummary && latestSummary.thresholds && latestSummary.counts) {
+          console.error('Returning the summary without an image after the timeout');
+          return resolve({
+            imagePath: outputFilePath,
+            imageBase64: null,
+            summaryData: latestSummary
+          });
+        }
+        return reject(new Error('Analysis timed out. The file may be too large or complex to process.'));
+      }
       
       if (code !== 0) {
         console.error(`Python process exited with code ${code}`);
@@ -147,7 +147,9 @@ const analyzeBCGMatrix = async (req, res) => {
         fs.mkdirSync(outputDir, { recursive: true });
       }
       
-      const result = await processBCGMatrix(fileToProcess, outputDir);
+      const result = await processBCGMatrix(fileToProcess, outputDir, {
+        onSummary: (summary) => console.log(`BCG summary ready: ${summary.counts.total} products${summary.partial ? ' (feedback and segments pending)' : ''}`)
+      });
       
       // Generate AI analysis using Gemini
       console.log("BCG matrix processing complete. Generating AI analysis...");
@@ -226,6 +228,32 @@ const analyzeBCGMatrix = async (req, res) => {
   }
 };
 
+/**
+ * @desc    One-line digest of the rating/review features ball.py attaches as `feedback`
+ * @access  Private (internal function)
+ */
+const formatFeedback = (feedback) => {
+  if (!feedback) return '';
+  const parts = [];
+  if (feedback.rating && feedback.rating.count > 0) {
+    parts.push(`rating ${feedback.rating.mean}/5 (${feedback.rating.count})`);
+  }
+  if (feedback.reviews > 0) {
+    parts.push(`sentiment ${feedback.sentiment >= 0 ? '+' : ''}${feedback.sentiment}`);
+    if (feedback.top_praise.length > 0) parts.push(`praise: ${feedback.top_praise.join(', ')}`);
+    if (feedback.top_complaints.length > 0) parts.push(`complaints: ${feedback.top_complaints.join(', ')}`);
+    const issues = Object.entries(feedback.issue_share)
+      .filter(([, share]) => share > 0)
+      .map(([issue, share]) => `${issue.replace('_', ' ')} ${Math.round(share * 100)}%`);
+    if (issues.length > 0) parts.push(`issues: ${issues.join(', ')}`);
+  }
+  return parts.join('; ');
+};
+
+// Gemini analyses by dataset name and summary, so re-running the same data skips the API call
+const ANALYSIS_CACHE_SIZE = 50;
+const analysisCache = new Map();
+
 /**
  * @desc    Generate analysis from Gemini AI
  * @access  Private (internal function)
@@ -242,14 +270,38 @@ const generateGeminiAnalysis = async (imageBase64, summary, dataName) => {
       useStaticAnalysis = true;
     }
     
+    // Nothing for the model to interpret when ball.py fell back to its error summary
+    if (summary.error || !summary.counts || summary.counts.total === 0) {
+      console.log("Summary has no analysed products. Using static analysis.");
+      useStaticAnalysis = true;
+    }
+    
+    const cacheKey = JSON.stringify([dataName, !!imageBase64, summary]);
+    if (!useStaticAnalysis && analysisCache.has(cacheKey)) {
+      console.log("Reusing the Gemini analysis of an identical summary");
+      return analysisCache.get(cacheKey);
+    }
+    
     // Format the top products information for the prompt
     let topProductsText = '';
     if (summary.top_products && summary.top_products.length > 0) {
       topProductsText = 'Top Products by Quantity:\n';
       summary.top_products.forEach((product, index) => {
-        topProductsText += `${index + 1}. ${product.name} (${product.quantity} units) - ${product.category} category\n`;
+        const feedbackText = formatFeedback(product.feedback);
+        topProductsText += `${index + 1}. ${product.name} (${product.quantity} units) - ${product.category} category${feedbackText ? ` [${feedbackText}]` : ''}\n`;
+      });
+    }
+
+    // Customer feedback per quadrant, precomputed by ball.py from the Rating/Review columns
+    let quadrantFeedbackLines = '';
+    if (summary.quadrants) {
+      const quadrantLabels = { star: 'Stars', cash_cow: 'Cash Cows', question_mark: 'Question Marks', dog: 'Dogs' };
+      Object.entries(quadrantLabels).forEach(([key, label]) => {
+        const feedbackText = formatFeedback(summary.quadrants[key]);
+        if (feedbackText) quadrantFeedbackLines += `- ${label}: ${feedbackText}\n`;
       });
     }
+    const quadrantFeedbackText = quadrantFeedbackLines ? `Customer Feedback by Quadrant:\n${quadrantFeedbackLines}` : '';
     
     // Use static analysis if API not available or for demo purposes
     if (useStaticAnalysis || !process.env.GOOGLE_API_KEY) {
@@ -290,7 +342,10 @@ Based on quantity data, your top-selling products fall primarily in the ${summar
 ${topProductsByCat.star.length > 0 ? `Your star products like ${topProductsByCat.star.slice(0, 2).join(", ")} demonstrate strong market position and growth potential.` : ""}
 ${topProductsByCat.cash_cow.length > 0 ? `Cash cow products such as ${topProductsByCat.cash_cow.slice(0, 2).join(", ")} provide reliable revenue streams.` : ""}
 
-## Strategic Recommendations
+${quadrantFeedbackLines ? `## Customer Feedback
+
+${quadrantFeedbackLines}
+` : ""}## Strategic Recommendations
 
 ### Stars (${starCount})
 ${starCount > 0 ? "- Continue investing in your Star products to maintain their market position" : "- Consider developing new Star products through innovation or acquisition"}
@@ -343,20 +398,24 @@ Based on purchase patterns, prioritize investment in your top-selling ${summary.
       return "Error: Failed to create Gemini model instance.";
     }
 
-    // Remove the data:image/png;base64, prefix if present
-    const imageData = imageBase64.replace(/^data:image\/png;base64,/, '');
-    
-    // Convert base64 to parts format Gemini API expects
-    const imagePart = {
-      inlineData: {
-        data: imageData,
-        mimeType: "image/png"
-      }
-    };
+    // The image is missing when the run was stopped after the summary was written
+    const contentParts = [];
+    if (imageBase64) {
+      // Remove the data:image/png;base64, prefix if present
+      const imageData = imageBase64.replace(/^data:image\/png;base64,/, '');
+      
+      // Convert base64 to parts format Gemini API expects
+      contentParts.push({
+        inlineData: {
+          data: imageData,
+          mimeType: "image/png"
+        }
+      });
+    }
     
     // Create a prompt with the image
     const prompt = `
-This is a BCG (Boston Consulting Group) Matrix analysis for the dataset "${dataName}".
+This is a BCG (Boston Consulting Group) Matrix analysis for the dataset "${dataName}".${imageBase64 ? '' : ' The matrix image is not available; use the figures below.'}
 
 The analysis shows:
 - Market Share Threshold: ${summary.thresholds.market_share.toFixed(2)}
@@ -368,22 +427,20 @@ The analysis shows:
 - Total Products: ${summary.counts.total}
 
 ${topProductsText}
+${quadrantFeedbackText}
+Product-level figures and customer feedback are already shown to the user; do not restate them. Provide only:
+1. The overall portfolio balance, in two or three sentences
+2. One concrete action per quadrant (Stars, Cash Cows, Question Marks, Dogs), citing the feedback where it matters
+3. The main risk and the main opportunity
 
-Based on the BCG Matrix image shown and the top products by quantity data, please provide:
-1. A strategic analysis of the overall portfolio balance
-2. Detailed insights on the most purchased products and their strategic importance
-3. Specific recommendations for each quadrant (Stars, Cash Cows, Question Marks, Dogs)
-4. Resource allocation advice prioritizing the most popular/purchased products
-5. Key risks and opportunities based on the purchase patterns
-
-Make your analysis actionable, insightful and business-oriented (around 350-450 words).
+Keep it business-oriented and under 200 words.
 `;
 
     console.log("Sending request to Gemini API...");
     
     // Generate content
     try {
-      const result = await model.generateContent([prompt, imagePart]);
+      const result = await model.generateContent([prompt, ...contentParts]);
       console.log("Received response from Gemini API");
       
       if (!result || !result.response) {
@@ -399,6 +456,10 @@ Make your analysis actionable, insightful and business-oriented (around 350-450
         return "Error: Generated text is empty. Please try again.";
       }
       
+      analysisCache.set(cacheKey, text);
+      if (analysisCache.size > ANALYSIS_CACHE_SIZE) {
+        analysisCache.delete(analysisCache.keys().next().value);
+      }
       return text;
     } catch (apiError) {
       console.error("Error in Gemini API call:", apiError);